@@ -3,40 +3,118 @@ from typing import Any, Dict, List, cast
 from boa3.builtin import CreateNewEvent, public
 from boa3.builtin.contract import abort
 from boa3.builtin.interop.binary import deserialize, serialize
-from boa3.builtin.interop.blockchain import Transaction
+from boa3.builtin.interop.blockchain import Transaction, current_index
 from boa3.builtin.interop.contract import GAS, call_contract, destroy_contract, update_contract
+from boa3.builtin.interop.crypto import sha256
 from boa3.builtin.interop.runtime import calling_script_hash, check_witness, executing_script_hash, script_container
 from boa3.builtin.interop.storage import delete, find, get, put
+from boa3.builtin.interop.storage.findoptions import FindOptions
 from boa3.builtin.type import UInt160, UInt256
 
 # -------------------------------------------
 # EVENTS
 # -------------------------------------------
 
-on_change_image = CreateNewEvent([('sender', UInt160)],
+on_change_image = CreateNewEvent([('sender', UInt160),
+                                  ('pool_id', UInt256),
+                                  ('kind', str)],
                                  'ChangeImage')
 
+# kinds of change of a pool, so listeners update only the pool that changed
+POOL_CREATED = 'created'
+BET_PLACED = 'bet'
+BET_CANCELLED = 'bet_cancelled'
+POOL_FINISHED = 'finished'
+POOL_CANCELLED = 'cancelled'
+REVEAL_STARTED = 'reveal_started'
+BETS_REVEALED = 'bets_revealed'
+
 # -------------------------------------------
 # STORAGE KEYS
 # -------------------------------------------
 
 OWNER_KEY = b'OWNER'
+SCHEMA_VERSION_KEY = b'SCHEMA_VERSION'
+LIMITS_KEY = b'LIMITS'
+POOL_COUNT_KEY = b'POOL_COUNT'
 POOL_OWNER_KEY = b'pool_owner_'
+POOL_HEADER_KEY = b'pool_header_'
 POOL_TOTAL_STAKE_KEY = b'pool_total_stake_'
 POOL_OPTIONS_KEY = b'pool_options_'
 POOL_DESCRIPTION_KEY = b'pool_description_'
 POOL_RESULT_KEY = b'pool_result_'
 POOL_BET_KEY = b'pool_bet_'
+POOL_COMMIT_KEY = b'pool_commit_'
+POOL_REVEAL_KEY = b'pool_reveal_'
+POOL_OPTION_COUNTS_KEY = b'pool_option_counts_'
+POOL_REFUNDING_KEY = b'pool_refunding_'
+POOL_REFUNDED_KEY = b'pool_refunded_'
+POOL_BET_COUNT_KEY = b'pool_number_of_bets_'
+POOL_SEQUENCE_KEY = b'pool_sequence_'
+TAG_INDEX_KEY = b'tag_index_'
+CREATOR_INDEX_KEY = b'creator_index_'
+TOKEN_KEY = b'token_'
+TOKEN_VOLUME_KEY = b'token_volume_'
 
 # -------------------------------------------
 # CONTRACT LOGIC
 # -------------------------------------------
 
+# initial defaults of the owner, also used by pools created before each pool had its own
 PRICE_IN_GAS = 1 * 10 ** 8  # bet cost is 1 GAS
+CANCEL_FEE_PERCENT = 5
+
+# limits used until the owner sets them, they keep the cost of every method bounded
+DEFAULT_MAX_OPTIONS = 10
+DEFAULT_MAX_DESCRIPTION_BYTES = 256
+DEFAULT_MAX_BETS_PER_POOL = 100
+
+MAX_TAGS = 5
+MAX_TAG_BYTES = 32
+MAX_PAGE_SIZE = 20
+
+# blocks the players have to reveal their bets, about a day, before the pool can be finished
+# with bets still committed
+REVEAL_WINDOW_BLOCKS = 5760
+
+# version of the storage layout, the updates from older versions migrate the pools
+SCHEMA_VERSION = 1
+
+# data of the stake transfers, the only payments accepted in tokens other than GAS
+STAKE_PAYMENT = 'stake'
 
 
 @public
 def get_pool(pool_id: UInt256) -> list:
+    pool = read_pool_fields(pool_id)
+
+    pool_bets: Dict[bytes, str] = {}
+    # the iterator strips the prefix, so the key is the player id
+    bets = find(POOL_BET_KEY + pool_id, options=FindOptions.REMOVE_PREFIX)
+    while bets.next():
+        result_pair = bets.value
+        pool_bets[cast(bytes, result_pair[0])] = cast(str, result_pair[1])
+
+    pool.append(pool_bets)
+    return pool
+
+
+@public
+def get_pool_compact(pool_id: UInt256) -> list:
+    # same as get_pool, but with the bets as a list of [player, option] pairs
+    pool = read_pool_fields(pool_id)
+
+    pool_bets: List[list] = []
+    bets = find(POOL_BET_KEY + pool_id, options=FindOptions.REMOVE_PREFIX)
+    while bets.next():
+        pool_bets.append(bets.value)
+
+    pool.append(pool_bets)
+    return pool
+
+
+def read_pool_fields(pool_id: UInt256) -> list:
+    # every field of a pool but its bets
     creator = get(POOL_OWNER_KEY + pool_id)
 
     if len(creator) == 0:
@@ -50,23 +128,11 @@ def get_pool(pool_id: UInt256) -> list:
     if len(serialized_result) > 0:
         result = deserialize(serialized_result)
 
-    pool_bets: Dict[bytes, str] = {}
-    bet_prefix = POOL_BET_KEY + pool_id
-    bets = find(bet_prefix)
-    while bets.next():
-        result_pair = bets.value
-        storage_key = cast(bytes, result_pair[0])
-        player_bet = cast(str, result_pair[1])
-        player_id = storage_key[len(bet_prefix):].to_str().to_bytes()
-
-        pool_bets[player_id] = player_bet
-
     return [pool_id,
             creator,
             description,
             options,
-            result,
-            pool_bets
+            result
             ]
 
 
@@ -74,11 +140,9 @@ def get_pool(pool_id: UInt256) -> list:
 def list_on_going_pools() -> list:
     pools = []
 
-    created_pools = find(POOL_OWNER_KEY)
+    created_pools = find(POOL_OWNER_KEY, options=FindOptions.KEYS_ONLY | FindOptions.REMOVE_PREFIX)
     while created_pools.next():
-        result_pair = created_pools.value
-        storage_key = cast(bytes, result_pair[0])
-        pool_id = storage_key[len(POOL_OWNER_KEY):]
+        pool_id = cast(bytes, created_pools.value)
         pool_hash: UInt256 = pool_id
 
         if len(get(POOL_RESULT_KEY + pool_id)) == 0:
@@ -89,8 +153,118 @@ def list_on_going_pools() -> list:
     return pools
 
 
+@public
+def list_pool_ids(page: int, page_size: int) -> List[UInt256]:
+    # in creation order, so pools created later never move the earlier pages
+    if page < 0 or page_size < 1 or page_size > MAX_PAGE_SIZE:
+        raise Exception('Invalid page')
+
+    pool_ids: List[UInt256] = []
+    pool_count = get(POOL_COUNT_KEY).to_int()
+    last_pool_number = min((page + 1) * page_size, pool_count)
+
+    for pool_number in range(page * page_size, last_pool_number):
+        pool_id: UInt256 = get(POOL_SEQUENCE_KEY + pool_number.to_bytes())
+        pool_ids.append(pool_id)
+
+    return pool_ids
+
+
+@public
+def list_pools(page: int, page_size: int) -> list:
+    # the pools of list_pool_ids, read in the same invocation
+    pools = []
+    for pool_id in list_pool_ids(page, page_size):
+        pool = get_pool(pool_id)
+        pools.append(pool)
+
+    return pools
+
+
+@public
+def list_pools_by_tag(tag: str, page: int, page_size: int) -> list:
+    # an empty tag would list the pools of every tag
+    if len(tag) == 0 or len(tag) > MAX_TAG_BYTES:
+        raise Exception('Invalid tag')
+
+    return list_indexed_pools(tag_index_prefix(tag), page, page_size)
+
+
+@public
+def list_pools_by_creator(creator: UInt160, page: int, page_size: int) -> list:
+    if len(creator) != 20:
+        raise Exception('Invalid creator')
+
+    return list_indexed_pools(CREATOR_INDEX_KEY + creator, page, page_size)
+
+
+def list_indexed_pools(index_prefix: bytes, page: int, page_size: int) -> list:
+    pools = []
+    for pool_id in list_indexed_pool_ids(index_prefix, page, page_size):
+        pool = get_pool(pool_id)
+        pools.append(pool)
+
+    return pools
+
+
+def list_indexed_pool_ids(index_prefix: bytes, page: int, page_size: int) -> List[UInt256]:
+    # every index key ends with the pool id
+    if page < 0 or page_size < 1 or page_size > MAX_PAGE_SIZE:
+        raise Exception('Invalid page')
+
+    pool_ids: List[UInt256] = []
+    skipped_pools = page * page_size
+
+    indexed_pools = find(index_prefix, options=FindOptions.KEYS_ONLY | FindOptions.REMOVE_PREFIX)
+    while len(pool_ids) < page_size and indexed_pools.next():
+        if skipped_pools > 0:
+            skipped_pools -= 1
+        else:
+            pool_hash: UInt256 = cast(bytes, indexed_pools.value)
+            pool_ids.append(pool_hash)
+
+    return pool_ids
+
+
+def tag_index_prefix(tag: str) -> bytes:
+    # the tag size is part of the key, so a tag is never listed as a prefix of a longer one
+    return TAG_INDEX_KEY + len(tag).to_bytes() + tag.to_bytes()
+
+
 @public
 def create_pool(creator: UInt160, description: str, options: List[str]) -> UInt256:
+    return new_pool(creator, description, options, [], -1, -1, False, GAS)
+
+
+@public
+def create_pool_with_settings(creator: UInt160, description: str, options: List[str],
+                              settings: Dict[str, Any]) -> UInt256:
+    # the settings that aren't given are the same as in create_pool:
+    #   'tags': list of tags to find the pool with, none by default
+    #   'stake', 'cancel_fee_percent': negative or not given use the defaults set by the owner
+    #   'commit_reveal': the bets are committed as hashes and revealed after betting ends
+    #   'token': stakes, prizes and refunds are paid in it, GAS or a token accepted by the owner
+    tags: List[str] = []
+    if 'tags' in settings:
+        tags = cast(List[str], settings['tags'])
+    stake = -1
+    if 'stake' in settings:
+        stake = cast(int, settings['stake'])
+    cancel_fee_percent = -1
+    if 'cancel_fee_percent' in settings:
+        cancel_fee_percent = cast(int, settings['cancel_fee_percent'])
+    commit_reveal = False
+    if 'commit_reveal' in settings:
+        commit_reveal = cast(bool, settings['commit_reveal'])
+    token = GAS
+    if 'token' in settings:
+        token = UInt160(cast(bytes, settings['token']))
+
+    return new_pool(creator, description, options, tags, stake, cancel_fee_percent, commit_reveal, token)
+
+
+def new_pool(creator: UInt160, description: str, options: List[str], tags: List[str],
+             stake: int, cancel_fee_percent: int, commit_reveal: bool, token: UInt160) -> UInt256:
     if not check_witness(creator):
         raise Exception('No authorization.')
 
@@ -102,15 +276,57 @@ def create_pool(creator: UInt160, description: str, options: List[str]) -> UInt2
         if len(option) == 0:
             raise Exception('Cannot have an empty option')
 
+    limits = get_limits()
+    if len(options) > limits[0]:
+        raise Exception('Too many options to create a pool')
+    if len(description) > limits[1]:
+        raise Exception('Description is too long')
+
+    tags: List[str] = remove_duplicates(tags)
+    if len(tags) > MAX_TAGS:
+        raise Exception('Too many tags')
+    for tag in tags:
+        if len(tag) == 0 or len(tag) > MAX_TAG_BYTES:
+            raise Exception('Invalid tag')
+
+    if token != GAS:
+        if len(get(TOKEN_KEY + token)) == 0:
+            raise Exception('Token is not accepted')
+        if stake < 0:
+            # the default stake is in GAS
+            raise Exception('Invalid pool economics')
+
+    if stake < 0 or cancel_fee_percent < 0:
+        default_economics = get_economics()
+        if stake < 0:
+            stake = default_economics[0]
+        if cancel_fee_percent < 0:
+            cancel_fee_percent = default_economics[1]
+    if stake == 0 or cancel_fee_percent > 100:
+        raise Exception('Invalid pool economics')
+
+    bet_mode = 0
+    if commit_reveal:
+        bet_mode = 1
+
     tx: Transaction = script_container
     pool_id = tx.hash
 
     put(POOL_OWNER_KEY + pool_id, creator)
+    put(POOL_HEADER_KEY + pool_id, serialize([stake, cancel_fee_percent, limits[2], bet_mode, token]))
     put(POOL_TOTAL_STAKE_KEY + pool_id, 0)
     put(POOL_OPTIONS_KEY + pool_id, serialize(options))
     put(POOL_DESCRIPTION_KEY + pool_id, description)
 
-    request_image_change()
+    pool_count = get(POOL_COUNT_KEY).to_int()
+    put(POOL_SEQUENCE_KEY + pool_count.to_bytes(), pool_id)
+    put(POOL_COUNT_KEY, pool_count + 1)
+
+    put(CREATOR_INDEX_KEY + creator + pool_id, 1)
+    for tag in tags:
+        put(tag_index_prefix(tag) + pool_id, 1)
+
+    request_image_change(pool_id, POOL_CREATED)
 
     return pool_id
 
@@ -136,6 +352,16 @@ def finish_pool(pool_id: UInt256, winner_options: List[str]):
         raise Exception('Pool is finished already')
     if len(winner_options) == 0:
         raise Exception('At least one winner is required')
+    pool_header = get_pool_header(pool_id)
+    if pool_header[3] == 1:
+        reveal_deadline = get(POOL_REVEAL_KEY + pool_id)
+        if len(reveal_deadline) == 0:
+            raise Exception('Bets are not being revealed')
+        if current_index < reveal_deadline.to_int():
+            # the bets not revealed by the deadline are lost
+            commits = find(POOL_COMMIT_KEY + pool_id, options=FindOptions.KEYS_ONLY)
+            if commits.next():
+                raise Exception('Bets are still being revealed')
 
     # validate all winner options are valid options
     winner_options: List[str] = remove_duplicates(winner_options)
@@ -146,31 +372,35 @@ def finish_pool(pool_id: UInt256, winner_options: List[str]):
 
     winners: List[UInt160] = []
 
-    # get winner players
-    bets_key_prefix = POOL_BET_KEY + pool_id
-    bet = find(bets_key_prefix)
+    # get winner players, the bets not revealed on commit-reveal pools are lost
+    bet = find(POOL_BET_KEY + pool_id, options=FindOptions.REMOVE_PREFIX)
     while bet.next():
         result_pair = bet.value
-        storage_key = cast(bytes, result_pair[0])
         account_bet = cast(str, result_pair[1])
 
         if account_bet in winner_options:
-            address = storage_key[len(bets_key_prefix):]
-            account = UInt160(address)
+            account = UInt160(cast(bytes, result_pair[0]))
             winners.append(account)
 
     # distribute the prizes
+    token = UInt160(cast(bytes, pool_header[4]))
+    total_stake = get(POOL_TOTAL_STAKE_KEY + pool_id).to_int()
     if len(winners) > 0:
-        total_stake = get(POOL_TOTAL_STAKE_KEY + pool_id).to_int()
         prize_per_winner = total_stake // len(winners)
         executing_contract = executing_script_hash
 
         for winner in winners:
-            transfer_gas(executing_contract, winner, prize_per_winner)
+            transfer_token(token, executing_contract, winner, prize_per_winner)
 
     # set result
     put(POOL_RESULT_KEY + pool_id, serialize(winner_options))
 
+    # the stakes of each token are added up when their pools finish, not on every bet
+    token_volume = get(TOKEN_VOLUME_KEY + token).to_int()
+    put(TOKEN_VOLUME_KEY + token, token_volume + total_stake)
+
+    request_image_change(pool_id, POOL_FINISHED)
+
 
 @public
 def cancel_pool(pool_id: UInt256):
@@ -185,48 +415,154 @@ def cancel_pool(pool_id: UInt256):
     if len(get(POOL_RESULT_KEY + pool_id)) > 0:
         raise Exception('Pool is finished already')
 
+    pool_header = get_pool_header(pool_id)
+    stake = cast(int, pool_header[0])
+    token = UInt160(cast(bytes, pool_header[4]))
     executing_contract = executing_script_hash
 
     # refund players
-    bets_key_prefix = POOL_BET_KEY + pool_id
-    bet = find(bets_key_prefix)
+    bet = find(POOL_BET_KEY + pool_id, options=FindOptions.KEYS_ONLY | FindOptions.REMOVE_PREFIX)
     while bet.next():
-        result_pair: List[bytes] = bet.value
-        storage_key = result_pair[0]
+        account = UInt160(cast(bytes, bet.value))
+        transfer_token(token, executing_contract, account, stake)
 
-        account = UInt160(storage_key[len(bets_key_prefix):])
-        transfer_gas(executing_contract, account, PRICE_IN_GAS)
+    if pool_header[3] == 1:
+        # and the bets not revealed yet
+        commit = find(POOL_COMMIT_KEY + pool_id, options=FindOptions.KEYS_ONLY | FindOptions.REMOVE_PREFIX)
+        while commit.next():
+            account = UInt160(cast(bytes, commit.value))
+            transfer_token(token, executing_contract, account, stake)
 
     # set result
     put(POOL_RESULT_KEY + pool_id, serialize('Cancelled by owner'))
 
+    request_image_change(pool_id, POOL_CANCELLED)
+
+
+@public
+def cancel_pools(pool_ids: List[UInt256], max_refunds: int) -> List[UInt256]:
+    # cancels many pools, refunding at most `max_refunds` bets; the pools that still have bets
+    # to refund are returned, to be passed again until none is left
+    owner = get_owner()
+    if not check_witness(owner):
+        raise Exception('No authorization.')
+    if max_refunds < 1:
+        raise Exception('Invalid batch size')
+
+    # refunds of each token to each player, paid with a single transfer each
+    refunds: Dict[UInt160, Dict[UInt160, int]] = {}
+    pending_pools: List[UInt256] = []
+    refunded_bets = 0
+
+    unique_pool_ids: List[UInt256] = remove_duplicates(pool_ids)
+    for pool_id in unique_pool_ids:
+        pool_header = get_pool_header(pool_id)
+        refunding_key = POOL_REFUNDING_KEY + pool_id
+        is_refunding = len(get(refunding_key)) > 0
+
+        if not is_refunding and len(get(POOL_RESULT_KEY + pool_id)) == 0:
+            put(POOL_RESULT_KEY + pool_id, serialize('Cancelled by owner'))
+            put(refunding_key, 1)
+            is_refunding = True
+            request_image_change(pool_id, POOL_CANCELLED)
+
+        # finished pools and pools cancelled by cancel_pool are skipped
+        if is_refunding:
+            refunded_key = POOL_REFUNDED_KEY + pool_id
+            refunded_before = get(refunded_key).to_int()
+            # the bets and commits of the pool are counted, so the bets left are known without iterating
+            bets_left = get(POOL_BET_COUNT_KEY + pool_id).to_int() - refunded_before
+            pool_refunds = min(bets_left, max_refunds - refunded_bets)
+            if pool_refunds > 0:
+                token = UInt160(cast(bytes, pool_header[4]))
+                if token not in refunds:
+                    refunds[token] = {}
+                token_refunds = refunds[token]
+
+                pool_refunds = refund_bets(pool_id, pool_header, token_refunds, refunded_before, pool_refunds)
+                refunded_bets += pool_refunds
+
+            if pool_refunds < bets_left and refunded_bets == max_refunds:
+                # the batch is full before the last bets of the pool
+                put(refunded_key, refunded_before + pool_refunds)
+                pending_pools.append(pool_id)
+            else:
+                delete(refunding_key)
+                delete(refunded_key)
+
+    executing_contract = executing_script_hash
+    for token in refunds.keys():
+        token_refunds = refunds[token]
+        for player in token_refunds.keys():
+            transfer_token(token, executing_contract, player, token_refunds[player])
+
+    return pending_pools
+
+
+def refund_bets(pool_id: UInt256, pool_header: list, token_refunds: Dict[UInt160, int], refunded_before: int,
+                max_refunds: int) -> int:
+    # the bets are kept for the pool history: the ones refunded by the previous batches are
+    # skipped, they can't change once the pool is cancelled
+    stake = cast(int, pool_header[0])
+    bets_prefixes = [POOL_BET_KEY + pool_id]
+    if pool_header[3] == 1:
+        bets_prefixes.append(POOL_COMMIT_KEY + pool_id)
+
+    position = 0
+    refunded_bets = 0
+    for bets_prefix in bets_prefixes:
+        bets = find(bets_prefix, options=FindOptions.KEYS_ONLY | FindOptions.REMOVE_PREFIX)
+        while refunded_bets < max_refunds and bets.next():
+            if position >= refunded_before:
+                player = UInt160(cast(bytes, bets.value))
+                if player in token_refunds:
+                    token_refunds[player] = token_refunds[player] + stake
+                else:
+                    token_refunds[player] = stake
+                refunded_bets += 1
+            position += 1
+
+    return refunded_bets
+
 
 @public
 def cancel_player_bet(player: UInt160, bet_id: UInt256):
-    if len(get(POOL_OWNER_KEY + bet_id)) == 0:
-        raise Exception("Pool doesn't exist.")
+    pool_header = get_pool_header(bet_id)
     if not check_witness(player):
         raise Exception('No authorization.')
     if len(get(POOL_RESULT_KEY + bet_id)) > 0:
         raise Exception('Pool is finished already')
-    if len(get(POOL_BET_KEY + bet_id + player)) == 0:
+
+    player_bet_key = POOL_BET_KEY + bet_id + player
+    if pool_header[3] == 1:
+        # committed bets can be cancelled until they start being revealed
+        if len(get(POOL_REVEAL_KEY + bet_id)) > 0:
+            raise Exception('Bets are being revealed already')
+        player_bet_key = POOL_COMMIT_KEY + bet_id + player
+    if len(get(player_bet_key)) == 0:
         raise Exception("Player didn't bet on this pool")
 
-    # 5% fee of the bet for cancelling
-    refund_value = PRICE_IN_GAS - PRICE_IN_GAS * 5 // 100
-    transfer_gas(executing_script_hash, player, refund_value)
+    # the pool's fee of the bet for cancelling
+    stake = cast(int, pool_header[0])
+    refund_value = stake - stake * cast(int, pool_header[1]) // 100
+    transfer_token(UInt160(cast(bytes, pool_header[4])), executing_script_hash, player, refund_value)
+
+    delete(player_bet_key)
+    bet_count = get(POOL_BET_COUNT_KEY + bet_id).to_int()
+    put(POOL_BET_COUNT_KEY + bet_id, bet_count - 1)
 
-    delete(POOL_BET_KEY + bet_id + player)
+    request_image_change(bet_id, BET_CANCELLED)
 
 
 @public
 def bet(player: UInt160, bet_id: UInt256, bet_option: str):
-    if len(get(POOL_OWNER_KEY + bet_id)) == 0:
-        raise Exception("Pool doesn't exist.")
+    pool_header = get_pool_header(bet_id)
     if not check_witness(player):
         raise Exception('No authorization.')
     if len(get(POOL_RESULT_KEY + bet_id)) > 0:
         raise Exception('Pool is finished already')
+    if pool_header[3] == 1:
+        raise Exception('Bets on this pool must be committed')
 
     player_vote_key = POOL_BET_KEY + bet_id + player
     if len(get(player_vote_key)) > 0:
@@ -236,33 +572,204 @@ def bet(player: UInt160, bet_id: UInt256, bet_option: str):
     if bet_option not in valid_options:
         raise Exception('Invalid option for this pool')
 
-    total_stake = get(POOL_TOTAL_STAKE_KEY + bet_id).to_int()
-    total_stake += PRICE_IN_GAS
-
-    transfer_gas(player, executing_script_hash, PRICE_IN_GAS)
+    take_stake(player, bet_id, pool_header)
     put(player_vote_key, bet_option)
-    put(POOL_TOTAL_STAKE_KEY + bet_id, total_stake)
 
-    request_image_change()
+    request_image_change(bet_id, BET_PLACED)
+
+
+@public
+def commit_bet(player: UInt160, pool_id: UInt256, commitment: bytes):
+    # the commitment is bet_commitment(pool_id, player, option, salt), only the player knows the option
+    pool_header = get_pool_header(pool_id)
+    if not check_witness(player):
+        raise Exception('No authorization.')
+    if len(get(POOL_RESULT_KEY + pool_id)) > 0:
+        raise Exception('Pool is finished already')
+    if pool_header[3] == 0:
+        raise Exception('Pool does not take committed bets')
+    if len(get(POOL_REVEAL_KEY + pool_id)) > 0:
+        raise Exception('Bets are being revealed already')
+
+    player_commit_key = POOL_COMMIT_KEY + pool_id + player
+    if len(get(player_commit_key)) > 0:
+        raise Exception('Only one bet is allowed per account')
+    if len(commitment) != 32:
+        raise Exception('Invalid commitment')
+
+    take_stake(player, pool_id, pool_header)
+    put(player_commit_key, commitment)
+
+    request_image_change(pool_id, BET_PLACED)
+
+
+def take_stake(player: UInt160, pool_id: UInt256, pool_header: list):
+    bet_count = get(POOL_BET_COUNT_KEY + pool_id).to_int()
+    if bet_count >= cast(int, pool_header[2]):
+        raise Exception('Pool is full')
+
+    stake = cast(int, pool_header[0])
+    total_stake = get(POOL_TOTAL_STAKE_KEY + pool_id).to_int()
+    total_stake += stake
+
+    # the token comes with the header, so betting in any token costs the same reads
+    transfer_token(UInt160(cast(bytes, pool_header[4])), player, executing_script_hash, stake)
+    put(POOL_TOTAL_STAKE_KEY + pool_id, total_stake)
+    put(POOL_BET_COUNT_KEY + pool_id, bet_count + 1)
+
+
+def bet_commitment(pool_id: UInt256, player: UInt160, option: str, salt: bytes) -> bytes:
+    # the option size is hashed too, so an option and its salt can't be split another way
+    return sha256(pool_id + player + len(option).to_bytes() + option.to_bytes() + salt)
+
+
+@public
+def start_reveal(pool_id: UInt256):
+    pool_header = get_pool_header(pool_id)
+    creator = UInt160(get(POOL_OWNER_KEY + pool_id))
+    if not check_witness(creator):
+        raise Exception('No authorization.')
+    if len(get(POOL_RESULT_KEY + pool_id)) > 0:
+        raise Exception('Pool is finished already')
+    if pool_header[3] == 0:
+        raise Exception('Pool does not take committed bets')
+    if len(get(POOL_REVEAL_KEY + pool_id)) > 0:
+        raise Exception('Bets are being revealed already')
+
+    # no bets are committed or cancelled after this, and the pool is finished once every bet
+    # is revealed or the deadline has passed
+    put(POOL_REVEAL_KEY + pool_id, current_index + REVEAL_WINDOW_BLOCKS)
+
+    request_image_change(pool_id, REVEAL_STARTED)
+
+
+@public
+def reveal_bets(pool_id: UInt256, reveals: List[list]) -> int:
+    # each reveal is [player, option, salt]; anyone may send them, those that don't match
+    # a commitment are skipped so one bad reveal doesn't fail the others
+    if len(get(POOL_REVEAL_KEY + pool_id)) == 0:
+        raise Exception('Bets are not being revealed')
+    if len(get(POOL_RESULT_KEY + pool_id)) > 0:
+        raise Exception('Pool is finished already')
+
+    # read and written once for all the reveals
+    option_counts = read_option_counts(pool_id)
+    revealed_bets = 0
+
+    for reveal in reveals:
+        # the malformed reveals are skipped too
+        if len(reveal) == 3 and len(cast(bytes, reveal[0])) == 20:
+            player = UInt160(cast(bytes, reveal[0]))
+            option = cast(str, reveal[1])
+            player_commit_key = POOL_COMMIT_KEY + pool_id + player
+
+            if option in option_counts:
+                commitment = get(player_commit_key)
+                if len(commitment) > 0 and bet_commitment(pool_id, player, option,
+                                                          cast(bytes, reveal[2])) == commitment:
+                    delete(player_commit_key)
+                    put(POOL_BET_KEY + pool_id + player, option)
+                    option_counts[option] = option_counts[option] + 1
+                    revealed_bets += 1
+
+    if revealed_bets > 0:
+        put(POOL_OPTION_COUNTS_KEY + pool_id, serialize(option_counts))
+        request_image_change(pool_id, BETS_REVEALED)
+
+    return revealed_bets
 
 
 @public
-def request_image_change():
+def get_option_counts(pool_id: UInt256) -> Dict[str, int]:
+    # revealed bets of each option, only counted on commit-reveal pools
+    if get_pool_header(pool_id)[3] == 0:
+        raise Exception('Pool does not take committed bets')
+
+    return read_option_counts(pool_id)
+
+
+def read_option_counts(pool_id: UInt256) -> Dict[str, int]:
+    serialized_counts = get(POOL_OPTION_COUNTS_KEY + pool_id)
+    if len(serialized_counts) > 0:
+        option_counts: Dict[str, int] = deserialize(serialized_counts)
+        return option_counts
+
+    options: List[str] = deserialize(get(POOL_OPTIONS_KEY + pool_id))
+    option_counts: Dict[str, int] = {}
+    for option in options:
+        option_counts[option] = 0
+
+    return option_counts
+
+
+@public
+def get_pool_header(pool_id: UInt256) -> list:
+    # [stake, cancel fee percent, max bets, commit-reveal (1) or public (0) bets, token], read
+    # once by the methods that need any of them
+    serialized_header = get(POOL_HEADER_KEY + pool_id)
+    if len(serialized_header) == 0:
+        if len(get(POOL_OWNER_KEY + pool_id)) == 0:
+            raise Exception("Pool doesn't exist.")
+        return [PRICE_IN_GAS, CANCEL_FEE_PERCENT, DEFAULT_MAX_BETS_PER_POOL, 0, GAS]
+
+    pool_header: list = deserialize(serialized_header)
+    if len(pool_header) < 4:
+        # created before the commit-reveal pools
+        pool_header.append(0)
+    if len(pool_header) < 5:
+        # created before the pools in other tokens
+        pool_header.append(GAS)
+    return pool_header
+
+
+def request_image_change(pool_id: UInt256, kind: str):
+    # only the methods that change the pool notify it, so listeners never read a pool for nothing
     invoker = calling_script_hash
-    on_change_image(invoker)
+    on_change_image(invoker, pool_id, kind)
 
 
-def transfer_gas(from_account: UInt160, to_account: UInt160, amount: int):
-    success: bool = call_contract(GAS, 'transfer', [from_account, to_account, amount, None])
+def transfer_token(token: UInt160, from_account: UInt160, to_account: UInt160, amount: int):
+    success: bool = call_contract(token, 'transfer', [from_account, to_account, amount, STAKE_PAYMENT])
     if not success:
-        raise Exception('GAS transfer was not successful')
+        if token == GAS:
+            raise Exception('GAS transfer was not successful')
+        raise Exception('Token transfer was not successful')
 
 
 @public
 def onNEP17Payment(from_address: UInt160, amount: int, data: Any):
-    # accept GAS only
+    # accept GAS, and the stakes in the accepted tokens: anyone can send the stake data,
+    # so it's the calling token that is checked
     if calling_script_hash != GAS:
-        abort()
+        if data != STAKE_PAYMENT:
+            abort()
+        if len(get(TOKEN_KEY + calling_script_hash)) == 0:
+            # the pools keep their token when it stops being accepted, but don't take new stakes in it
+            raise Exception('Token is not accepted')
+
+
+@public
+def get_token_volume(token: UInt160) -> int:
+    # total stake of the finished pools in the token
+    return get(TOKEN_VOLUME_KEY + token).to_int()
+
+
+@public
+def is_token_accepted(token: UInt160) -> bool:
+    return token == GAS or len(get(TOKEN_KEY + token)) > 0
+
+
+@public
+def set_token_accepted(token: UInt160, accepted: bool):
+    owner = get_owner()
+    if not check_witness(owner):
+        raise Exception('No authorization.')
+
+    # pools created with the token keep it after it stops being accepted
+    if accepted:
+        put(TOKEN_KEY + token, 1)
+    else:
+        delete(TOKEN_KEY + token)
 
 
 # -------------------------------------------
@@ -272,20 +779,112 @@ def onNEP17Payment(from_address: UInt160, amount: int, data: Any):
 
 @public
 def _deploy(data: Any, update: bool):
+    owner_record = get(OWNER_KEY)
     if update:
-        # do nothing on update
+        if len(owner_record) == 20:
+            # the owner was stored alone before the default economics were added to its record
+            put(OWNER_KEY, serialize([owner_record, PRICE_IN_GAS, CANCEL_FEE_PERCENT]))
+        if get(SCHEMA_VERSION_KEY).to_int() < SCHEMA_VERSION:
+            migrate_pools()
+            put(SCHEMA_VERSION_KEY, SCHEMA_VERSION)
         return
 
-    if get(OWNER_KEY).to_int() > 0:
+    if len(owner_record) > 0:
         # it was deployed already
         return
 
-    put(OWNER_KEY, "NMmy263woLS5thu238tj2WSzcYQNrP4ZqV".to_script_hash())
+    owner = "NMmy263woLS5thu238tj2WSzcYQNrP4ZqV".to_script_hash()
+    put(OWNER_KEY, serialize([owner, PRICE_IN_GAS, CANCEL_FEE_PERCENT]))
+    put(SCHEMA_VERSION_KEY, SCHEMA_VERSION)
+
+
+def migrate_pools():
+    # fills what the pools created by earlier versions of the contract lack; it reads every
+    # pool, so it only runs on the update from a version before the storage was versioned
+
+    # no pool has a number until one is created by a version that numbers them, then the
+    # pools of the earlier versions are numbered in the order of their ids
+    number_pools = get(POOL_COUNT_KEY).to_int() == 0
+    pool_count = 0
+
+    created_pools = find(POOL_OWNER_KEY, options=FindOptions.REMOVE_PREFIX)
+    while created_pools.next():
+        created_pool = created_pools.value
+        pool_id = cast(bytes, created_pool[0])
+        creator = cast(bytes, created_pool[1])
+
+        if number_pools:
+            put(POOL_SEQUENCE_KEY + pool_count.to_bytes(), pool_id)
+            pool_count += 1
+
+        if len(get(CREATOR_INDEX_KEY + creator + pool_id)) == 0:
+            # created before the pools were indexed, they had no tags
+            put(CREATOR_INDEX_KEY + creator + pool_id, 1)
+
+        if len(get(POOL_BET_COUNT_KEY + pool_id)) == 0:
+            # created before the bets were counted, their limit is the default one
+            bet_count = 0
+            bets = find(POOL_BET_KEY + pool_id, options=FindOptions.KEYS_ONLY)
+            while bets.next():
+                bet_count += 1
+            if bet_count > 0:
+                put(POOL_BET_COUNT_KEY + pool_id, bet_count)
+
+    if number_pools and pool_count > 0:
+        put(POOL_COUNT_KEY, pool_count)
+
+
+def get_owner_record() -> list:
+    # [owner, default stake, default cancel fee percent]
+    owner_record: list = deserialize(get(OWNER_KEY))
+    return owner_record
+
+
+def get_owner() -> UInt160:
+    return UInt160(cast(bytes, get_owner_record()[0]))
+
+
+@public
+def get_economics() -> List[int]:
+    owner_record = get_owner_record()
+    return [cast(int, owner_record[1]), cast(int, owner_record[2])]
+
+
+@public
+def set_economics(default_stake: int, default_cancel_fee_percent: int):
+    owner_record = get_owner_record()
+    if not check_witness(UInt160(cast(bytes, owner_record[0]))):
+        raise Exception('No authorization.')
+    if default_stake <= 0 or default_cancel_fee_percent < 0 or default_cancel_fee_percent > 100:
+        raise Exception('Invalid pool economics')
+
+    put(OWNER_KEY, serialize([owner_record[0], default_stake, default_cancel_fee_percent]))
+
+
+@public
+def get_limits() -> List[int]:
+    serialized_limits = get(LIMITS_KEY)
+    if len(serialized_limits) == 0:
+        return [DEFAULT_MAX_OPTIONS, DEFAULT_MAX_DESCRIPTION_BYTES, DEFAULT_MAX_BETS_PER_POOL]
+
+    limits: List[int] = deserialize(serialized_limits)
+    return limits
+
+
+@public
+def set_limits(max_options: int, max_description_bytes: int, max_bets_per_pool: int):
+    owner = get_owner()
+    if not check_witness(owner):
+        raise Exception('No authorization.')
+    if max_options < 2 or max_description_bytes < 0 or max_bets_per_pool < 1:
+        raise Exception('Invalid limits')
+
+    put(LIMITS_KEY, serialize([max_options, max_description_bytes, max_bets_per_pool]))
 
 
 @public
 def update(script: bytes, manifest: bytes):
-    owner = UInt160(get(OWNER_KEY))
+    owner = get_owner()
     if not check_witness(owner):
         raise Exception('No authorization.')
 
@@ -294,7 +893,7 @@ def update(script: bytes, manifest: bytes):
 
 @public
 def destroy():
-    owner = UInt160(get(OWNER_KEY))
+    owner = get_owner()
     if not check_witness(owner):
         raise Exception('No authorization.')
 
@@ -1,4 +1,6 @@
+import json
 import os.path
+import sys
 import unittest
 from typing import List
 
@@ -7,6 +9,11 @@ from boa3.neo.smart_contract.VoidType import VoidType
 from boa3.neo3.vm import VMState
 from boa3_test.tests.test_classes.testengine import TestEngine
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.engine_driver import GAS_SCRIPT, normalize_pool
+from tools.reference_model import CONTRACT_OWNER, NEO_TOKEN, REVEAL_WINDOW_BLOCKS, bet_commitment
+
 
 class TestSmartContract(unittest.TestCase):
     engine: TestEngine
@@ -25,20 +32,54 @@ class TestSmartContract(unittest.TestCase):
         if not os.path.isfile(cls.nef_path):
             Boa3.compile_and_save(path, output_path=cls.nef_path)
 
-    def test_request_image_change(self):
-        self.engine.reset_engine()
-        on_change_image_event_name = 'ChangeImage'
+    def test_request_image_change_is_not_public(self):
+        with open(self.nef_path.replace('.nef', '.manifest.json')) as manifest_file:
+            manifest = json.load(manifest_file)
 
-        result = self.engine.run(self.nef_path, 'request_image_change')
-        self.assertEqual(VMState.HALT, self.engine.vm_state)
-        self.assertEqual(VoidType, result)
+        public_methods = [method['name'] for method in manifest['abi']['methods']]
+        self.assertIn('bet', public_methods)
+        self.assertNotIn('request_image_change', public_methods)
 
-        event_notifications = self.engine.get_events(event_name=on_change_image_event_name)
+    def _last_change(self) -> list:
+        event_notifications = self.engine.get_events(event_name='ChangeImage')
         self.assertEqual(1, len(event_notifications))
+        return list(event_notifications[0].arguments[1:])
+
+    def test_change_events_carry_pool_and_kind(self):
+        self.engine.reset_engine()
+
+        creator_account = bytes(20)
+        options = ['choice1', 'choice2', 'choice3']
+        player = bytes(range(20))
+
+        pool_id = self._create_pool(creator_account, 'Bet for testing', options)
+        self.assertEqual([pool_id, 'created'], self._last_change())
 
-    def _create_pool(self, creator_account: bytes, description: str, options: List[str]):
+        self._bet(pool_id, player, 'choice1')
+        self.assertEqual([pool_id, 'bet'], self._last_change())
+
+        self.engine.add_signer_account(player)
+        self.engine.run(self.nef_path, 'cancel_player_bet', player, pool_id)
+        self.assertEqual([pool_id, 'bet_cancelled'], self._last_change())
+
+        self.engine.add_signer_account(creator_account)
+        self.engine.run(self.nef_path, 'finish_pool', pool_id, ['choice1'])
+        self.assertEqual([pool_id, 'finished'], self._last_change())
+
+        other_pool_id = self._create_pool(creator_account, 'Other bet', options)
         self.engine.add_signer_account(creator_account)
-        return self.engine.run(self.nef_path, 'create_pool', creator_account, description, options)
+        self.engine.run(self.nef_path, 'cancel_pool', other_pool_id)
+        self.assertEqual([other_pool_id, 'cancelled'], self._last_change())
+
+    def _create_pool(self, creator_account: bytes, description: str, options: List[str], tags: List[str] = None,
+                     **settings):
+        self.engine.add_signer_account(creator_account)
+        if tags is not None:
+            settings['tags'] = tags
+        if len(settings) == 0:
+            return self.engine.run(self.nef_path, 'create_pool', creator_account, description, options)
+        return self.engine.run(self.nef_path, 'create_pool_with_settings', creator_account, description, options,
+                               settings)
 
     def test_create_pool_success(self):
         self.engine.reset_engine()
@@ -96,8 +137,73 @@ class TestSmartContract(unittest.TestCase):
         self.assertEqual(VMState.FAULT, self.engine.vm_state)
         self.assertTrue(self.engine.error.endswith('Cannot have an empty option'))
 
-    def _bet(self, pool_id: bytes, player: bytes, option: str):
-        price_in_gas = 1 * 10 ** 8  # 1 GAS
+    def test_create_pool_fail_too_many_options(self):
+        self.engine.reset_engine()
+
+        creator_account = bytes(20)
+        description = 'Bet for testing'
+        options = ['choice{0}'.format(index) for index in range(11)]
+
+        self.engine.add_signer_account(creator_account)
+        self.engine.run(self.nef_path, 'create_pool', creator_account, description, options)
+        self.assertEqual(VMState.FAULT, self.engine.vm_state)
+        self.assertTrue(self.engine.error.endswith('Too many options to create a pool'))
+
+    def test_create_pool_fail_description_too_long(self):
+        self.engine.reset_engine()
+
+        creator_account = bytes(20)
+        description = 'a' * 257
+        options = ['choice1', 'choice2', 'choice3']
+
+        self.engine.add_signer_account(creator_account)
+        self.engine.run(self.nef_path, 'create_pool', creator_account, description, options)
+        self.assertEqual(VMState.FAULT, self.engine.vm_state)
+        self.assertTrue(self.engine.error.endswith('Description is too long'))
+
+    def test_create_pool_fail_too_many_tags(self):
+        self.engine.reset_engine()
+
+        creator_account = bytes(20)
+        description = 'Bet for testing'
+        options = ['choice1', 'choice2', 'choice3']
+        tags = ['tag{0}'.format(index) for index in range(6)]
+
+        self._create_pool(creator_account, description, options, tags)
+        self.assertEqual(VMState.FAULT, self.engine.vm_state)
+        self.assertTrue(self.engine.error.endswith('Too many tags'))
+
+    def test_create_pool_fail_invalid_tag(self):
+        self.engine.reset_engine()
+
+        creator_account = bytes(20)
+        description = 'Bet for testing'
+        options = ['choice1', 'choice2', 'choice3']
+
+        self._create_pool(creator_account, description, options, ['sports', ''])
+        self.assertEqual(VMState.FAULT, self.engine.vm_state)
+        self.assertTrue(self.engine.error.endswith('Invalid tag'))
+
+        self._create_pool(creator_account, description, options, ['a' * 33])
+        self.assertEqual(VMState.FAULT, self.engine.vm_state)
+        self.assertTrue(self.engine.error.endswith('Invalid tag'))
+
+    def test_create_pool_fail_invalid_economics(self):
+        self.engine.reset_engine()
+
+        creator_account = bytes(20)
+        description = 'Bet for testing'
+        options = ['choice1', 'choice2', 'choice3']
+
+        self._create_pool(creator_account, description, options, stake=0)
+        self.assertEqual(VMState.FAULT, self.engine.vm_state)
+        self.assertTrue(self.engine.error.endswith('Invalid pool economics'))
+
+        self._create_pool(creator_account, description, options, cancel_fee_percent=101)
+        self.assertEqual(VMState.FAULT, self.engine.vm_state)
+        self.assertTrue(self.engine.error.endswith('Invalid pool economics'))
+
+    def _bet(self, pool_id: bytes, player: bytes, option: str, price_in_gas: int = 1 * 10 ** 8):
         self.engine.add_gas(player, price_in_gas)
         self.engine.add_signer_account(player)
         self.engine.run(self.nef_path, 'bet', player, pool_id, option)
@@ -211,6 +317,31 @@ class TestSmartContract(unittest.TestCase):
         self.assertEqual(VMState.FAULT, self.engine.vm_state)
         self.assertTrue(self.engine.error.endswith('GAS transfer was not successful'))
 
+    def test_bet_fail_pool_full(self):
+        self.engine.reset_engine()
+        self._set_limits(10, 256, 1)
+
+        creator_account = bytes(20)
+        description = 'Bet for testing'
+        options = ['choice1', 'choice2', 'choice3']
+
+        pool_id = self._create_pool(creator_account, description, options)
+        self._bet(pool_id, bytes(range(20)), 'choice1')
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+
+        player = bytes(range(1, 21))
+        self._bet(pool_id, player, 'choice2')
+        self.assertEqual(VMState.FAULT, self.engine.vm_state)
+        self.assertTrue(self.engine.error.endswith('Pool is full'))
+
+        # cancelling a bet frees its place
+        self.engine.add_signer_account(bytes(range(20)))
+        self.engine.run(self.nef_path, 'cancel_player_bet', bytes(range(20)), pool_id)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+
+        self._bet(pool_id, player, 'choice2')
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+
     def _finish_pool(self, creator_account: bytes, pool_id: bytes, winners: List[str]):
         self.engine.add_signer_account(creator_account)
         self.engine.run(self.nef_path, 'finish_pool', pool_id, winners)
@@ -507,6 +638,31 @@ class TestSmartContract(unittest.TestCase):
         self.assertEqual(player, bet1_player)
         self.assertEqual(bet_option, bet1_choice)
 
+    def test_get_pool_compact_success(self):
+        self.engine.reset_engine()
+
+        creator_account = bytes(20)
+        description = 'Bet for testing'
+        options = ['choice1', 'choice2', 'choice3']
+        pool_id = self._create_pool(creator_account, description, options)
+
+        players = [bytes([index]) * 20 for index in range(1, 3)]
+        self._bet(pool_id, players[0], 'choice1')
+        self._bet(pool_id, players[1], 'choice2')
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+
+        result = self.engine.run(self.nef_path, 'get_pool_compact', pool_id)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+        self.assertEqual(6, len(result))
+        self.assertEqual(pool_id, result[0])
+        self.assertEqual(description, result[2])
+        self.assertIsNone(result[4])
+
+        # the same bets as get_pool, as [player, option] pairs
+        bets = [[player.encode('utf-8') if isinstance(player, str) else player, option]
+                for player, option in result[5]]
+        self.assertEqual([[players[0], 'choice1'], [players[1], 'choice2']], bets)
+
     def test_get_pool_success_finished(self):
         self.engine.reset_engine()
 
@@ -642,3 +798,542 @@ class TestSmartContract(unittest.TestCase):
         self.assertEqual(VMState.HALT, self.engine.vm_state)
         self.assertIsInstance(result, list)
         self.assertEqual(0, len(result))
+
+    def _set_limits(self, max_options: int, max_description_bytes: int, max_bets_per_pool: int):
+        self.engine.add_signer_account(CONTRACT_OWNER)
+        self.engine.run(self.nef_path, 'set_limits', max_options, max_description_bytes, max_bets_per_pool)
+
+    def test_get_limits_default(self):
+        self.engine.reset_engine()
+
+        result = self.engine.run(self.nef_path, 'get_limits')
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+        self.assertEqual([10, 256, 100], result)
+
+    def test_set_limits_success(self):
+        self.engine.reset_engine()
+
+        self._set_limits(3, 8, 2)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+
+        result = self.engine.run(self.nef_path, 'get_limits')
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+        self.assertEqual([3, 8, 2], result)
+
+        creator_account = bytes(20)
+        self._create_pool(creator_account, 'Bet for testing', ['choice1', 'choice2', 'choice3', 'choice4'])
+        self.assertEqual(VMState.FAULT, self.engine.vm_state)
+        self.assertTrue(self.engine.error.endswith('Too many options to create a pool'))
+
+        self._create_pool(creator_account, 'Bet for testing', ['choice1', 'choice2', 'choice3'])
+        self.assertEqual(VMState.FAULT, self.engine.vm_state)
+        self.assertTrue(self.engine.error.endswith('Description is too long'))
+
+    def test_update_keeps_pools(self):
+        self.engine.reset_engine()
+
+        creator_account = bytes(20)
+        options = ['choice1', 'choice2']
+        pool_ids = [self._create_pool(creator_account, f'Pool {index}', options) for index in range(2)]
+        players = [bytes([index]) * 20 for index in range(1, 3)]
+        for player in players:
+            self._bet(pool_ids[0], player, 'choice1')
+
+        with open(self.nef_path, 'rb') as nef_file:
+            script = nef_file.read()
+        with open(self.nef_path.replace('.nef', '.manifest.json'), 'rb') as manifest_file:
+            manifest = manifest_file.read()
+
+        # the storage of this version is up to date, the update doesn't number the pools again
+        self.engine.add_signer_account(CONTRACT_OWNER)
+        self.engine.run(self.nef_path, 'update', script, manifest)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+
+        pool_ids.append(self._create_pool(creator_account, 'Pool 2', options))
+        result = self.engine.run(self.nef_path, 'list_pool_ids', 0, 10)
+        self.assertEqual(pool_ids, result)
+        result = self.engine.run(self.nef_path, 'list_pools_by_creator', creator_account, 0, 10)
+        self.assertEqual(3, len(result))
+        result = self.engine.run(self.nef_path, 'get_pool', pool_ids[0])
+        self.assertEqual(2, len(result[5]))
+
+    def test_set_limits_fail_check_witness(self):
+        self.engine.reset_engine()
+
+        self.engine.run(self.nef_path, 'set_limits', 3, 16, 2)
+        self.assertEqual(VMState.FAULT, self.engine.vm_state)
+        self.assertTrue(self.engine.error.endswith('No authorization.'))
+
+    def test_set_limits_fail_invalid_limits(self):
+        self.engine.reset_engine()
+
+        self._set_limits(1, 16, 2)
+        self.assertEqual(VMState.FAULT, self.engine.vm_state)
+        self.assertTrue(self.engine.error.endswith('Invalid limits'))
+
+        self._set_limits(3, 16, 0)
+        self.assertEqual(VMState.FAULT, self.engine.vm_state)
+        self.assertTrue(self.engine.error.endswith('Invalid limits'))
+
+    def test_list_pools_by_tag_success(self):
+        self.engine.reset_engine()
+
+        creator_account = bytes(20)
+        options = ['choice1', 'choice2', 'choice3']
+
+        sports_pool = self._create_pool(creator_account, 'Sports pool', options, ['sports'])
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+        self._create_pool(creator_account, 'Space pool', options, ['sportsman', 'space'])
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+
+        result = self.engine.run(self.nef_path, 'list_pools_by_tag', 'sports', 0, 10)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+        self.assertEqual(1, len(result))
+        self.assertEqual(sports_pool, result[0][0])
+        self.assertEqual('Sports pool', result[0][2])
+
+        result = self.engine.run(self.nef_path, 'list_pools_by_tag', 'news', 0, 10)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+        self.assertEqual([], result)
+
+    def test_list_pools_by_creator_success(self):
+        self.engine.reset_engine()
+
+        creator_account = bytes(20)
+        other_creator = bytes(range(20))
+        options = ['choice1', 'choice2', 'choice3']
+
+        pool_ids = [self._create_pool(creator_account, 'Pool {0}'.format(index), options) for index in range(3)]
+        self._create_pool(other_creator, 'Other pool', options)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+
+        first_page = self.engine.run(self.nef_path, 'list_pools_by_creator', creator_account, 0, 2)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+        second_page = self.engine.run(self.nef_path, 'list_pools_by_creator', creator_account, 1, 2)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+
+        self.assertEqual(2, len(first_page))
+        self.assertEqual(1, len(second_page))
+        self.assertEqual(sorted(pool_ids), [pool[0] for pool in first_page + second_page])
+
+    def test_list_pools_by_creator_fail_invalid_page(self):
+        self.engine.reset_engine()
+
+        self.engine.run(self.nef_path, 'list_pools_by_creator', bytes(20), -1, 10)
+        self.assertEqual(VMState.FAULT, self.engine.vm_state)
+        self.assertTrue(self.engine.error.endswith('Invalid page'))
+
+        self.engine.run(self.nef_path, 'list_pools_by_creator', bytes(20), 0, 21)
+        self.assertEqual(VMState.FAULT, self.engine.vm_state)
+        self.assertTrue(self.engine.error.endswith('Invalid page'))
+
+    def test_list_pools_by_tag_fail_invalid_tag(self):
+        self.engine.reset_engine()
+
+        self._create_pool(bytes(20), 'Sports pool', ['choice1', 'choice2'], ['sports'])
+        # the empty tag is a prefix of every tag
+        self.engine.run(self.nef_path, 'list_pools_by_tag', '', 0, 10)
+        self.assertEqual(VMState.FAULT, self.engine.vm_state)
+        self.assertTrue(self.engine.error.endswith('Invalid tag'))
+
+    def test_get_pool_header_success(self):
+        self.engine.reset_engine()
+
+        creator_account = bytes(20)
+        options = ['choice1', 'choice2', 'choice3']
+
+        default_pool = self._create_pool(creator_account, 'Default pool', options)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+        micro_pool = self._create_pool(creator_account, 'Micro pool', options, stake=1000, cancel_fee_percent=10)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+
+        result = self.engine.run(self.nef_path, 'get_pool_header', default_pool)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+        self.assertEqual([1 * 10 ** 8, 5, 100, 0, GAS_SCRIPT], result)
+
+        result = self.engine.run(self.nef_path, 'get_pool_header', micro_pool)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+        self.assertEqual([1000, 10, 100, 0, GAS_SCRIPT], result)
+
+    def test_bet_and_cancel_with_pool_economics(self):
+        self.engine.reset_engine()
+
+        creator_account = bytes(20)
+        options = ['choice1', 'choice2', 'choice3']
+        pool_id = self._create_pool(creator_account, 'Micro pool', options, stake=1000, cancel_fee_percent=10)
+
+        player = bytes(range(20))
+        self._bet(pool_id, player, 'choice1', price_in_gas=1000)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+
+        self.engine.add_signer_account(player)
+        self.engine.run(self.nef_path, 'cancel_player_bet', player, pool_id)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+
+        result = self.engine.run(GAS_SCRIPT, 'balanceOf', player)
+        self.assertEqual(900, result)
+
+    def _set_economics(self, default_stake: int, default_cancel_fee_percent: int):
+        self.engine.add_signer_account(CONTRACT_OWNER)
+        self.engine.run(self.nef_path, 'set_economics', default_stake, default_cancel_fee_percent)
+
+    def test_set_economics_success(self):
+        self.engine.reset_engine()
+
+        result = self.engine.run(self.nef_path, 'get_economics')
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+        self.assertEqual([1 * 10 ** 8, 5], result)
+
+        self._set_economics(5000, 0)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+
+        result = self.engine.run(self.nef_path, 'get_economics')
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+        self.assertEqual([5000, 0], result)
+
+        pool_id = self._create_pool(bytes(20), 'Bet for testing', ['choice1', 'choice2'])
+        result = self.engine.run(self.nef_path, 'get_pool_header', pool_id)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+        self.assertEqual([5000, 0, 100, 0, GAS_SCRIPT], result)
+
+    def test_set_economics_fail_check_witness(self):
+        self.engine.reset_engine()
+
+        self.engine.run(self.nef_path, 'set_economics', 5000, 0)
+        self.assertEqual(VMState.FAULT, self.engine.vm_state)
+        self.assertTrue(self.engine.error.endswith('No authorization.'))
+
+    def test_set_economics_fail_invalid_economics(self):
+        self.engine.reset_engine()
+
+        self._set_economics(0, 5)
+        self.assertEqual(VMState.FAULT, self.engine.vm_state)
+        self.assertTrue(self.engine.error.endswith('Invalid pool economics'))
+
+        self._set_economics(5000, 101)
+        self.assertEqual(VMState.FAULT, self.engine.vm_state)
+        self.assertTrue(self.engine.error.endswith('Invalid pool economics'))
+
+    def test_list_pool_ids_success(self):
+        self.engine.reset_engine()
+
+        creator_account = bytes(20)
+        options = ['choice1', 'choice2', 'choice3']
+        pool_ids = [self._create_pool(creator_account, 'Pool {0}'.format(index), options) for index in range(3)]
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+
+        first_page = self.engine.run(self.nef_path, 'list_pool_ids', 0, 2)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+        second_page = self.engine.run(self.nef_path, 'list_pool_ids', 1, 2)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+        third_page = self.engine.run(self.nef_path, 'list_pool_ids', 2, 2)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+
+        # in creation order
+        self.assertEqual(pool_ids, first_page + second_page)
+        self.assertEqual([], third_page)
+
+    def test_list_pools_success(self):
+        self.engine.reset_engine()
+
+        creator_account = bytes(20)
+        options = ['choice1', 'choice2', 'choice3']
+        pool_ids = [self._create_pool(creator_account, 'Pool {0}'.format(index), options) for index in range(3)]
+        player = bytes(range(20))
+        self._bet(pool_ids[2], player, 'choice2')
+
+        result = self.engine.run(self.nef_path, 'list_pools', 1, 2)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+        self.assertEqual(1, len(result))
+        self.assertEqual([pool_ids[2], creator_account, 'Pool 2', options, None, {player: 'choice2'}],
+                         normalize_pool(result[0]))
+
+    def _commit_bet(self, pool_id: bytes, player: bytes, option: str, salt: bytes, price_in_gas: int = 1 * 10 ** 8):
+        self.engine.add_gas(player, price_in_gas)
+        self.engine.add_signer_account(player)
+        self.engine.run(self.nef_path, 'commit_bet', player, pool_id, bet_commitment(pool_id, player, option, salt))
+
+    def test_commit_reveal_success(self):
+        self.engine.reset_engine()
+
+        creator_account = bytes(20)
+        options = ['choice1', 'choice2', 'choice3']
+        pool_id = self._create_pool(creator_account, 'Sealed pool', options, commit_reveal=True)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+
+        players = [bytes([index]) * 20 for index in range(1, 4)]
+        bets = ['choice1', 'choice1', 'choice2']
+        salts = [bytes([index]) * 16 for index in range(1, 4)]
+        for player, option, salt in zip(players, bets, salts):
+            self._commit_bet(pool_id, player, option, salt)
+            self.assertEqual(VMState.HALT, self.engine.vm_state)
+
+        # the committed bets aren't visible
+        result = self.engine.run(self.nef_path, 'get_pool', pool_id)
+        self.assertEqual({}, result[5])
+
+        self.engine.add_signer_account(creator_account)
+        self.engine.run(self.nef_path, 'start_reveal', pool_id)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+
+        # one transaction reveals every bet, the one with a wrong salt and the malformed ones are skipped
+        reveals = [[player, option, salt] for player, option, salt in zip(players, bets, salts)]
+        reveals[2][2] = bytes(16)
+        reveals.extend([[players[2], bets[2]], [players[2][:10], bets[2], salts[2]]])
+        result = self.engine.run(self.nef_path, 'reveal_bets', pool_id, reveals)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+        self.assertEqual(2, result)
+
+        result = self.engine.run(self.nef_path, 'get_option_counts', pool_id)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+        self.assertEqual({'choice1': 2, 'choice2': 0, 'choice3': 0}, result)
+
+        # the last player has until the deadline to reveal
+        self.engine.add_signer_account(creator_account)
+        self.engine.run(self.nef_path, 'finish_pool', pool_id, ['choice1'])
+        self.assertEqual(VMState.FAULT, self.engine.vm_state)
+        self.assertTrue(self.engine.error.endswith('Bets are still being revealed'))
+
+        self.engine.increase_block(self.engine.height + REVEAL_WINDOW_BLOCKS)
+        self.engine.add_signer_account(creator_account)
+        self.engine.run(self.nef_path, 'finish_pool', pool_id, ['choice1'])
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+
+    def test_finish_pool_every_bet_revealed(self):
+        self.engine.reset_engine()
+
+        creator_account = bytes(20)
+        options = ['choice1', 'choice2']
+        pool_id = self._create_pool(creator_account, 'Sealed pool', options, commit_reveal=True)
+        player = bytes(range(20))
+        self._commit_bet(pool_id, player, 'choice2', bytes(16))
+
+        self.engine.add_signer_account(creator_account)
+        self.engine.run(self.nef_path, 'start_reveal', pool_id)
+        self.engine.run(self.nef_path, 'reveal_bets', pool_id, [[player, 'choice2', bytes(16)]])
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+
+        # no need to wait for the deadline
+        self.engine.add_signer_account(creator_account)
+        self.engine.run(self.nef_path, 'finish_pool', pool_id, ['choice2'])
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+
+    def test_commit_bet_fail_public_pool(self):
+        self.engine.reset_engine()
+
+        creator_account = bytes(20)
+        options = ['choice1', 'choice2', 'choice3']
+        pool_id = self._create_pool(creator_account, 'Bet for testing', options)
+
+        self._commit_bet(pool_id, bytes(range(20)), 'choice1', bytes(16))
+        self.assertEqual(VMState.FAULT, self.engine.vm_state)
+        self.assertTrue(self.engine.error.endswith('Pool does not take committed bets'))
+
+    def test_commit_bet_fail_reveal_started(self):
+        self.engine.reset_engine()
+
+        creator_account = bytes(20)
+        options = ['choice1', 'choice2', 'choice3']
+        pool_id = self._create_pool(creator_account, 'Sealed pool', options, commit_reveal=True)
+        self._bet(pool_id, bytes(range(20)), 'choice1')
+        self.assertEqual(VMState.FAULT, self.engine.vm_state)
+        self.assertTrue(self.engine.error.endswith('Bets on this pool must be committed'))
+
+        self.engine.add_signer_account(creator_account)
+        self.engine.run(self.nef_path, 'start_reveal', pool_id)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+
+        self._commit_bet(pool_id, bytes(range(20)), 'choice1', bytes(16))
+        self.assertEqual(VMState.FAULT, self.engine.vm_state)
+        self.assertTrue(self.engine.error.endswith('Bets are being revealed already'))
+
+    def test_reveal_bets_fail_not_revealing(self):
+        self.engine.reset_engine()
+
+        creator_account = bytes(20)
+        options = ['choice1', 'choice2', 'choice3']
+        pool_id = self._create_pool(creator_account, 'Sealed pool', options, commit_reveal=True)
+        player = bytes(range(20))
+        self._commit_bet(pool_id, player, 'choice1', bytes(16))
+
+        self.engine.run(self.nef_path, 'reveal_bets', pool_id, [[player, 'choice1', bytes(16)]])
+        self.assertEqual(VMState.FAULT, self.engine.vm_state)
+        self.assertTrue(self.engine.error.endswith('Bets are not being revealed'))
+
+    def test_pool_in_other_token_success(self):
+        self.engine.reset_engine()
+
+        creator_account = bytes(20)
+        options = ['choice1', 'choice2']
+        self._create_pool(creator_account, 'NEO pool', options, stake=2, token=NEO_TOKEN)
+        self.assertEqual(VMState.FAULT, self.engine.vm_state)
+        self.assertTrue(self.engine.error.endswith('Token is not accepted'))
+
+        self.engine.add_signer_account(CONTRACT_OWNER)
+        self.engine.run(self.nef_path, 'set_token_accepted', NEO_TOKEN, True)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+
+        # the default stake is in GAS
+        self._create_pool(creator_account, 'NEO pool', options, token=NEO_TOKEN)
+        self.assertEqual(VMState.FAULT, self.engine.vm_state)
+        self.assertTrue(self.engine.error.endswith('Invalid pool economics'))
+
+        pool_id = self._create_pool(creator_account, 'NEO pool', options, stake=2, token=NEO_TOKEN)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+
+        players = [bytes([index]) * 20 for index in range(1, 3)]
+        for player, option in zip(players, options):
+            self.engine.add_neo(player, 2)
+            self.engine.add_signer_account(player)
+            self.engine.run(self.nef_path, 'bet', player, pool_id, option)
+            self.assertEqual(VMState.HALT, self.engine.vm_state)
+
+        self.engine.add_signer_account(creator_account)
+        self.engine.run(self.nef_path, 'finish_pool', pool_id, ['choice1'])
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+
+        result = self.engine.run(NEO_TOKEN, 'balanceOf', players[0])
+        self.assertEqual(4, result)
+        result = self.engine.run(self.nef_path, 'get_token_volume', NEO_TOKEN)
+        self.assertEqual(4, result)
+
+    def test_pool_in_delisted_token(self):
+        self.engine.reset_engine()
+
+        creator_account = bytes(20)
+        options = ['choice1', 'choice2']
+        self.engine.add_signer_account(CONTRACT_OWNER)
+        self.engine.run(self.nef_path, 'set_token_accepted', NEO_TOKEN, True)
+        pool_id = self._create_pool(creator_account, 'NEO pool', options, stake=2, token=NEO_TOKEN)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+
+        players = [bytes([index]) * 20 for index in range(1, 3)]
+        for player in players:
+            self.engine.add_neo(player, 2)
+        self.engine.add_signer_account(players[0])
+        self.engine.run(self.nef_path, 'bet', players[0], pool_id, 'choice1')
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+
+        self.engine.add_signer_account(CONTRACT_OWNER)
+        self.engine.run(self.nef_path, 'set_token_accepted', NEO_TOKEN, False)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+
+        # the pool doesn't take new stakes, but still pays the ones it has
+        self.engine.add_signer_account(players[1])
+        self.engine.run(self.nef_path, 'bet', players[1], pool_id, 'choice2')
+        self.assertEqual(VMState.FAULT, self.engine.vm_state)
+        self.assertTrue(self.engine.error.endswith('Token is not accepted'))
+
+        self.engine.add_signer_account(creator_account)
+        self.engine.run(self.nef_path, 'finish_pool', pool_id, ['choice1'])
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+
+        result = self.engine.run(NEO_TOKEN, 'balanceOf', players[0])
+        self.assertEqual(2, result)
+
+    def test_set_token_accepted_fail_check_witness(self):
+        self.engine.reset_engine()
+
+        self.engine.run(self.nef_path, 'set_token_accepted', NEO_TOKEN, True)
+        self.assertEqual(VMState.FAULT, self.engine.vm_state)
+        self.assertTrue(self.engine.error.endswith('No authorization.'))
+
+    def test_cancel_pools_success(self):
+        self.engine.reset_engine()
+
+        creator_account = bytes(20)
+        options = ['choice1', 'choice2']
+        pool_ids = [self._create_pool(creator_account, f'Pool {index}', options) for index in range(3)]
+        players = [bytes([index]) * 20 for index in range(1, 4)]
+        for pool_id in pool_ids:
+            for player in players:
+                self._bet(pool_id, player, 'choice1')
+        self._finish_pool(creator_account, pool_ids[2], ['choice1'])
+        balances = [self.engine.run(GAS_SCRIPT, 'balanceOf', player) for player in players]
+
+        # the first batch refunds the first pool and the first player of the second one
+        self.engine.add_signer_account(CONTRACT_OWNER)
+        result = self.engine.run(self.nef_path, 'cancel_pools', pool_ids, 4)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+        self.assertEqual(pool_ids[1:2], result)
+        self.assertEqual(3, len(self.engine.get_events(event_name='Transfer')))
+
+        result = self.engine.run(self.nef_path, 'get_pool', pool_ids[1])
+        self.assertEqual('Cancelled by owner', result[4])
+        self.assertEqual(3, len(result[5]))
+
+        self.engine.add_signer_account(CONTRACT_OWNER)
+        result = self.engine.run(self.nef_path, 'cancel_pools', pool_ids, 4)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+        self.assertEqual([], result)
+
+        for player, balance in zip(players, balances):
+            result = self.engine.run(GAS_SCRIPT, 'balanceOf', player)
+            self.assertEqual(balance + 2 * 10 ** 8, result)
+        result = self.engine.run(self.nef_path, 'get_pool', pool_ids[2])
+        self.assertEqual(['choice1'], result[4])
+
+    def test_cancel_pools_pending_only_with_bets_left(self):
+        self.engine.reset_engine()
+
+        creator_account = bytes(20)
+        options = ['choice1', 'choice2']
+        pool_ids = [self._create_pool(creator_account, f'Pool {index}', options) for index in range(2)]
+        players = [bytes([index]) * 20 for index in range(1, 3)]
+        for pool_id in pool_ids:
+            for player in players:
+                self._bet(pool_id, player, 'choice1')
+
+        # the first pool fills the batch exactly, the second one is listed once
+        self.engine.add_signer_account(CONTRACT_OWNER)
+        result = self.engine.run(self.nef_path, 'cancel_pools', [pool_ids[0], pool_ids[1], pool_ids[1]], 2)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+        self.assertEqual(pool_ids[1:], result)
+
+        self.engine.add_signer_account(CONTRACT_OWNER)
+        result = self.engine.run(self.nef_path, 'cancel_pools', [pool_ids[1], pool_ids[1]], 2)
+        self.assertEqual(VMState.HALT, self.engine.vm_state)
+        self.assertEqual([], result)
+        self.assertEqual(2, len(self.engine.get_events(event_name='Transfer')))
+
+    def test_cancel_pools_keeps_bets(self):
+        self.engine.reset_engine()
+
+        creator_account = bytes(20)
+        options = ['choice1', 'choice2']
+        pool_id = self._create_pool(creator_account, 'Bet for testing', options)
+        players = [bytes([index]) * 20 for index in range(1, 4)]
+        for player, option in zip(players, ['choice1', 'choice2', 'choice1']):
+            self._bet(pool_id, player, option)
+        balances = [self.engine.run(GAS_SCRIPT, 'balanceOf', player) for player in players]
+
+        for _ in range(3):
+            self.engine.add_signer_account(CONTRACT_OWNER)
+            self.engine.run(self.nef_path, 'cancel_pools', [pool_id], 2)
+            self.assertEqual(VMState.HALT, self.engine.vm_state)
+
+        # every bet is refunded once, and the pool still lists them
+        for player, balance in zip(players, balances):
+            result = self.engine.run(GAS_SCRIPT, 'balanceOf', player)
+            self.assertEqual(balance + 10 ** 8, result)
+        result = normalize_pool(self.engine.run(self.nef_path, 'get_pool', pool_id))
+        self.assertEqual('Cancelled by owner', result[4])
+        self.assertEqual({players[0]: 'choice1', players[1]: 'choice2', players[2]: 'choice1'}, result[5])
+
+    def test_cancel_pools_fail_check_witness(self):
+        self.engine.reset_engine()
+
+        pool_id = self._create_pool(bytes(20), 'Bet for testing', ['choice1', 'choice2'])
+        self.engine.add_signer_account(bytes(20))
+        self.engine.run(self.nef_path, 'cancel_pools', [pool_id], 10)
+        self.assertEqual(VMState.FAULT, self.engine.vm_state)
+        self.assertTrue(self.engine.error.endswith('No authorization.'))
+
+    def test_cancel_pools_fail_invalid_batch_size(self):
+        self.engine.reset_engine()
+
+        pool_id = self._create_pool(bytes(20), 'Bet for testing', ['choice1', 'choice2'])
+        self.engine.add_signer_account(CONTRACT_OWNER)
+        self.engine.run(self.nef_path, 'cancel_pools', [pool_id], 0)
+        self.assertEqual(VMState.FAULT, self.engine.vm_state)
+        self.assertTrue(self.engine.error.endswith('Invalid batch size'))
@@ -0,0 +1,122 @@
+import asyncio
+import base64
+import json
+import os.path
+import sys
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.change_feed import ChangeFeed, PoolChange, parse_changes
+from tools.reference_model import PRICE_IN_GAS, BetOnFlybyModel, Operation
+
+
+def byte_string(value: bytes) -> dict:
+    return {'type': 'ByteString', 'value': base64.b64encode(value).decode('ascii')}
+
+
+def change_message(*changes) -> dict:
+    # message of the Dora contract log with a ChangeImage notification per change
+    notifications = [{'event_name': 'ChangeImage',
+                      'state': {'type': 'Array',
+                                'value': [byte_string(bytes(20)), byte_string(pool_id),
+                                          byte_string(kind.encode('utf-8'))]}}
+                     for pool_id, kind in changes]
+    return {'height': 1, 'log': {'notifications': notifications}}
+
+
+class TestChangeFeed(unittest.TestCase):
+
+    def setUp(self):
+        self.model = BetOnFlybyModel()
+        self.creator = bytes(20)
+        self.read_pools = []
+
+    def _create_pool(self, description: str) -> bytes:
+        arguments = [self.creator, description, ['choice1', 'choice2']]
+        operation = Operation('create_pool', arguments, self.creator, 0)
+        return self.model.apply(operation).result
+
+    def _bet(self, pool_id: bytes, player: bytes):
+        self.model.apply(Operation('bet', [player, pool_id, 'choice1'], player, PRICE_IN_GAS))
+
+    def _read_pool(self, pool_id: bytes) -> list:
+        self.read_pools.append(pool_id)
+        if pool_id not in self.model.pools:
+            raise RuntimeError("Pool doesn't exist.")
+        return self.model.pools[pool_id].as_contract_result()
+
+    def test_parse_changes(self):
+        pool_id = bytes(range(32))
+        message = change_message((pool_id, 'bet'))
+        message['log']['notifications'].append({'event_name': 'Transfer', 'state': {'type': 'Array', 'value': []}})
+        # emitted by the contract versions without the pool in the event
+        message['log']['notifications'].append({'event_name': 'ChangeImage',
+                                                'state': {'type': 'Array', 'value': [byte_string(bytes(20))]}})
+
+        self.assertEqual([PoolChange(pool_id, 'bet')], parse_changes(message))
+        self.assertEqual([], parse_changes({'height': 2}))
+
+    def test_pool_read_once_for_all_subscribers(self):
+        pool_id = self._create_pool('Bet for testing')
+        player = bytes(range(20))
+        self._bet(pool_id, player)
+
+        feed = ChangeFeed(self._read_pool)
+        everything = feed.subscribe()
+        followers = feed.subscribe([pool_id.hex()])
+        others = feed.subscribe([bytes(32).hex()])
+
+        asyncio.run(feed.handle_message(change_message((pool_id, 'bet'))))
+        self.assertEqual([pool_id], self.read_pools)
+        self.assertEqual(0, others.pending())
+
+        delta = asyncio.run(followers.next_delta())
+        self.assertEqual('bet', delta['kind'])
+        self.assertEqual({player.hex(): 'choice1'}, delta['pool']['bets'])
+        self.assertEqual(delta, asyncio.run(everything.next_delta()))
+
+    def test_unfollowed_pools_are_not_read(self):
+        pool_id = self._create_pool('Bet for testing')
+        feed = ChangeFeed(self._read_pool)
+        feed.subscribe([bytes(32).hex()])
+
+        self.assertEqual(0, asyncio.run(feed.handle_message(change_message((pool_id, 'created')))))
+        self.assertEqual([], self.read_pools)
+
+    def test_slow_subscriber_keeps_latest_delta_per_pool(self):
+        first_pool = self._create_pool('First')
+        second_pool = self._create_pool('Second')
+        feed = ChangeFeed(self._read_pool)
+        subscription = feed.subscribe()
+
+        async def stand_in_log():
+            # local stand-in of the Dora websocket
+            yield json.dumps(change_message((first_pool, 'created')))
+            yield json.dumps(change_message((second_pool, 'created')))
+            self._bet(first_pool, bytes(range(20)))
+            yield json.dumps(change_message((first_pool, 'bet'), (first_pool, 'bet')))
+
+        asyncio.run(feed.run(stand_in_log()))
+        self.assertEqual(3, len(self.read_pools))
+        self.assertEqual(2, subscription.pending())
+
+        deltas = [asyncio.run(subscription.next_delta()) for _ in range(2)]
+        self.assertEqual([second_pool.hex(), first_pool.hex()], [delta['pool_id'] for delta in deltas])
+        self.assertEqual('bet', deltas[1]['kind'])
+        self.assertEqual(1, len(deltas[1]['pool']['bets']))
+
+    def test_unreadable_pool_is_skipped(self):
+        pool_id = self._create_pool('Bet for testing')
+        feed = ChangeFeed(self._read_pool)
+        subscription = feed.subscribe()
+
+        async def stand_in_log():
+            # the node can't read the first pool
+            yield json.dumps(change_message((bytes(32), 'bet')))
+            yield json.dumps(change_message((pool_id, 'created')))
+
+        with self.assertLogs('tools.change_feed', level='WARNING'):
+            asyncio.run(feed.run(stand_in_log()))
+        self.assertEqual(1, subscription.pending())
+        self.assertEqual(pool_id.hex(), asyncio.run(subscription.next_delta())['pool_id'])
@@ -0,0 +1,259 @@
+import os.path
+import random
+import sys
+import unittest
+from typing import List
+
+from boa3.boa3 import Boa3
+from boa3_test.tests.test_classes.testengine import TestEngine
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.engine_driver import ContractRunner, as_bytes, normalize_compact_pool, normalize_pool
+from tools.reference_model import GAS_TOKEN, NEO_TOKEN, PRICE_IN_GAS, BetOnFlybyModel, Operation, bet_commitment
+
+FUZZ_SEEDS = int(os.environ.get('FUZZ_SEEDS', 3))
+FUZZ_STEPS = int(os.environ.get('FUZZ_STEPS', 40))
+
+POOL_LIST_METHODS = ['list_on_going_pools', 'list_pools', 'list_pools_by_tag', 'list_pools_by_creator']
+
+
+class OperationGenerator:
+    """Random operation sequences, mostly valid ones, picked from the model's current state."""
+
+    def __init__(self, rng: random.Random, model: BetOnFlybyModel, accounts: List[bytes]):
+        self.rng = rng
+        self.model = model
+        self.accounts = accounts
+        self.options = ['choice1', 'choice2', 'choice3', 'choice4']
+        self.tags = ['sports', 'sportsman', 'space', 'news']
+        self._descriptions = 0
+        # option and salt of the committed bets, to reveal them later
+        self._committed_bets = {}
+
+    def next_operation(self) -> Operation:
+        if len(self.model.pools) == 0:
+            return self.create_pool()
+
+        kind = self.rng.choices(['create_pool', 'bet', 'cancel_player_bet', 'finish_pool', 'cancel_pool',
+                                 'set_limits', 'set_economics', 'list_pools_by_tag', 'list_pools_by_creator',
+                                 'list_pool_ids', 'commit_bet', 'start_reveal', 'reveal_bets', 'get_pool_compact',
+                                 'set_token_accepted', 'cancel_pools', 'list_pools'],
+                                weights=[10, 45, 15, 15, 10, 3, 3, 3, 3, 3, 20, 5, 8, 3, 2, 4, 3])[0]
+        return getattr(self, kind)()
+
+    def _account(self) -> bytes:
+        return self.rng.choice(self.accounts)
+
+    def _pool_id(self) -> bytes:
+        if self.rng.random() < 0.05:
+            return bytes(32)    # pool that doesn't exist
+        return self.rng.choice(sorted(self.model.pools))
+
+    def _commit_reveal_pool_id(self, revealing: bool) -> bytes:
+        pool_ids = [pool_id for pool_id, pool in sorted(self.model.pools.items())
+                    if pool.commit_reveal and pool.revealing == revealing and not pool.is_finished]
+        if len(pool_ids) == 0 or self.rng.random() < 0.2:
+            return self._pool_id()
+        return self.rng.choice(pool_ids)
+
+    def _signer(self, expected: bytes) -> bytes:
+        return self._account() if self.rng.random() < 0.1 else expected
+
+    def create_pool(self) -> Operation:
+        creator = self._account()
+        self._descriptions += 1     # different scripts, so each pool gets its own transaction hash
+        options = self.rng.sample(self.options, self.rng.randint(1, len(self.options)))
+        if self.rng.random() < 0.1:
+            options.append(self.rng.choice(options + ['']))
+        description = f'Pool {self._descriptions}'
+        if self.rng.random() < 0.05:
+            description += ' ' * self.rng.randint(8, 300)
+        if self.rng.random() < 0.2:
+            return Operation('create_pool', [creator, description, options], self._signer(creator), 0)
+
+        # each setting is left out sometimes, to use its default
+        settings = {'tags': self.rng.sample(self.tags, self.rng.randint(0, 2)),
+                    'stake': self.rng.choice([-1, -1, 0, 1000, PRICE_IN_GAS // 2]),
+                    'cancel_fee_percent': self.rng.choice([-1, -1, 0, 50, 101]),
+                    'commit_reveal': self.rng.random() < 0.3,
+                    # the accounts get GAS only, so the bets on NEO pools fail on both sides
+                    'token': NEO_TOKEN if self.rng.random() < 0.1 else GAS_TOKEN}
+        settings = {key: value for key, value in settings.items() if self.rng.random() < 0.8}
+        return Operation('create_pool_with_settings', [creator, description, options, settings],
+                         self._signer(creator), 0)
+
+    def bet(self) -> Operation:
+        player = self._account()
+        pool_id = self._pool_id()
+        options = self.model.pools[pool_id].options if pool_id in self.model.pools else self.options
+        option = self.rng.choice(options + ['invalid'] if self.rng.random() < 0.05 else options)
+        stake = self.model.pools[pool_id].stake if pool_id in self.model.pools else PRICE_IN_GAS
+        gas = stake if self.rng.random() < 0.9 else 0
+        return Operation('bet', [player, pool_id, option], self._signer(player), gas)
+
+    def commit_bet(self) -> Operation:
+        player = self._account()
+        pool_id = self._commit_reveal_pool_id(revealing=False)
+        options = self.model.pools[pool_id].options if pool_id in self.model.pools else self.options
+        option = self.rng.choice(options + ['invalid'] if self.rng.random() < 0.05 else options)
+        salt = self.rng.randbytes(16)
+        self._committed_bets[(pool_id, player)] = (option, salt)
+
+        commitment = bet_commitment(pool_id, player, option, salt)
+        if self.rng.random() < 0.05:
+            commitment = commitment[:16]
+        stake = self.model.pools[pool_id].stake if pool_id in self.model.pools else PRICE_IN_GAS
+        gas = stake if self.rng.random() < 0.9 else 0
+        return Operation('commit_bet', [player, pool_id, commitment], self._signer(player), gas)
+
+    def start_reveal(self) -> Operation:
+        pool_id = self._commit_reveal_pool_id(revealing=False)
+        pool = self.model.pools.get(pool_id)
+        creator = pool.creator if pool is not None else self._account()
+        return Operation('start_reveal', [pool_id], self._signer(creator), 0)
+
+    def reveal_bets(self) -> Operation:
+        pool_id = self._commit_reveal_pool_id(revealing=True)
+        pool = self.model.pools.get(pool_id)
+        players = sorted(pool.commits) if pool is not None else []
+        reveals = []
+        for player in self.rng.sample(players, self.rng.randint(0, len(players))) + [self._account()]:
+            option, salt = self._committed_bets.get((pool_id, player), (self.options[0], bytes(16)))
+            if self.rng.random() < 0.1:
+                salt = bytes(16)
+            reveals.append([player, option, salt])
+        if self.rng.random() < 0.05:
+            # malformed reveals are skipped
+            reveals.append(self.rng.choice([reveals[0][:2], [reveals[0][0][:10]] + reveals[0][1:]]))
+        # anyone may reveal the bets
+        return Operation('reveal_bets', [pool_id, reveals], None, 0)
+
+    def cancel_player_bet(self) -> Operation:
+        pool_id = self._pool_id()
+        pool = self.model.pools.get(pool_id)
+        if pool is not None and pool.bet_count > 0 and self.rng.random() < 0.8:
+            player = self.rng.choice(pool.sorted_bets() + sorted(pool.commits))
+        else:
+            player = self._account()
+        return Operation('cancel_player_bet', [player, pool_id], self._signer(player), 0)
+
+    def finish_pool(self) -> Operation:
+        pool_id = self._pool_id()
+        pool = self.model.pools.get(pool_id)
+        options = pool.options if pool is not None else self.options
+        winners = self.rng.sample(options, self.rng.randint(0, len(options)))
+        creator = pool.creator if pool is not None else self._account()
+        return Operation('finish_pool', [pool_id, winners], self._signer(creator), 0)
+
+    def set_limits(self) -> Operation:
+        limits = [self.rng.randint(1, 5), self.rng.randint(8, 300), self.rng.randint(0, 6)]
+        return Operation('set_limits', limits, self._signer(self.model.owner), 0)
+
+    def set_economics(self) -> Operation:
+        economics = [self.rng.choice([0, 500, PRICE_IN_GAS]), self.rng.choice([0, 5, 100, 101])]
+        return Operation('set_economics', economics, self._signer(self.model.owner), 0)
+
+    def list_pools_by_tag(self) -> Operation:
+        return Operation('list_pools_by_tag', [self.rng.choice(self.tags + ['']), self.rng.randint(0, 2),
+                                               self.rng.randint(1, 3)], None, 0)
+
+    def list_pools_by_creator(self) -> Operation:
+        return Operation('list_pools_by_creator', [self._account(), self.rng.randint(0, 2),
+                                                   self.rng.randint(1, 3)], None, 0)
+
+    def list_pool_ids(self) -> Operation:
+        return Operation('list_pool_ids', [self.rng.randint(0, 2), self.rng.randint(1, 3)], None, 0)
+
+    def list_pools(self) -> Operation:
+        return Operation('list_pools', [self.rng.randint(0, 2), self.rng.randint(1, 3)], None, 0)
+
+    def set_token_accepted(self) -> Operation:
+        return Operation('set_token_accepted', [NEO_TOKEN, self.rng.random() < 0.7], self._signer(self.model.owner), 0)
+
+    def get_pool_compact(self) -> Operation:
+        return Operation('get_pool_compact', [self._pool_id()], None, 0)
+
+    def cancel_pool(self) -> Operation:
+        pool_id = self._pool_id()
+        pool = self.model.pools.get(pool_id)
+        creator = pool.creator if pool is not None else self._account()
+        return Operation('cancel_pool', [pool_id], self._signer(creator), 0)
+
+    def cancel_pools(self) -> Operation:
+        # small batches, so the pools are often left pending and cancelled again
+        refunding = [pool_id for pool_id, pool in sorted(self.model.pools.items()) if pool.refunding]
+        pool_ids = refunding + [self._pool_id() for _ in range(self.rng.randint(0, 3))]
+        self.rng.shuffle(pool_ids)
+        return Operation('cancel_pools', [pool_ids, self.rng.randint(0, 4)], self._signer(self.model.owner), 0)
+
+
+class TestDifferential(unittest.TestCase):
+    engine: TestEngine
+
+    @classmethod
+    def setUpClass(cls):
+        folders = os.path.abspath(__file__).split(os.sep)
+        cls.dirname = '/'.join(folders[:-2])
+
+        test_engine_installation_folder = cls.dirname   # Change this to your test engine installation folder
+        cls.engine = TestEngine(test_engine_installation_folder)
+
+        path = f'{cls.dirname}/src/BetOnFlyby.py'
+        cls.nef_path = path.replace('.py', '.nef')
+
+        if not os.path.isfile(cls.nef_path):
+            Boa3.compile_and_save(path, output_path=cls.nef_path)
+
+    def _assert_same_state(self, runner: ContractRunner, model: BetOnFlybyModel, step: int):
+        for pool_id in sorted(model.pools):
+            self.assertEqual(model.pools[pool_id].as_contract_result(), runner.get_pool(pool_id),
+                             f'pool {pool_id.hex()} differs after step {step}')
+
+        for account, balance in sorted(model.balances.items()):
+            self.assertEqual(balance, runner.gas_balance(account),
+                             f'GAS balance of {account.hex()} differs after step {step}')
+
+        # the stakes the contract holds, and what it settled, in each token
+        for token in (GAS_TOKEN, NEO_TOKEN):
+            self.assertEqual(model.contract_balances.get(token, 0), runner.contract_token_balance(token),
+                             f'contract balance of {token.hex()} differs after step {step}')
+            self.assertEqual(model.token_volumes.get(token, 0), runner.token_volume(token),
+                             f'volume of {token.hex()} differs after step {step}')
+
+    def _run_sequence(self, seed: int):
+        self.engine.reset_engine()
+        rng = random.Random(seed)
+        model = BetOnFlybyModel()
+        runner = ContractRunner(self.engine, self.nef_path)
+        accounts = [bytes([index + 1]) * 20 for index in range(6)]
+        generator = OperationGenerator(rng, model, accounts)
+
+        for step in range(FUZZ_STEPS):
+            operation = generator.next_operation()
+            contract_outcome = runner.apply(operation)
+            model_outcome = model.apply(operation, pool_id=contract_outcome.result)
+
+            message = f'seed {seed}, step {step}: {operation}'
+            self.assertEqual(model_outcome.success, contract_outcome.success,
+                             f'{message} -> {contract_outcome.error or model_outcome.error}')
+            if not model_outcome.success:
+                self.assertTrue(contract_outcome.error.endswith(model_outcome.error),
+                                f'{message} -> {contract_outcome.error}')
+            elif operation.method in POOL_LIST_METHODS:
+                self.assertEqual(model_outcome.result, [normalize_pool(pool) for pool in contract_outcome.result],
+                                 message)
+            elif operation.method == 'get_pool_compact':
+                self.assertEqual(model_outcome.result, normalize_compact_pool(contract_outcome.result), message)
+            elif operation.method == 'reveal_bets':
+                self.assertEqual(model_outcome.result, contract_outcome.result, message)
+            elif operation.method in ('list_pool_ids', 'cancel_pools'):
+                self.assertEqual(model_outcome.result, [as_bytes(pool_id) for pool_id in contract_outcome.result],
+                                 message)
+
+            self._assert_same_state(runner, model, step)
+
+    def test_random_sequences_match_reference_model(self):
+        for seed in range(FUZZ_SEEDS):
+            with self.subTest(seed=seed):
+                self._run_sequence(seed)
@@ -0,0 +1,155 @@
+import base64
+import importlib.util
+import os.path
+import sys
+import tempfile
+import unittest
+from typing import Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.export_history import ColumnarWriter, HistoryExporter, normalize_rpc_pool, pool_tables, stack_item_value
+from tools.reference_model import PRICE_IN_GAS, BetOnFlybyModel, Operation
+
+
+class MemoryWriter:
+    def __init__(self, fail_on_part: int = -1):
+        self.parts: Dict[str, Dict[int, Dict[str, list]]] = {'pools': {}, 'bets': {}}
+        self.fail_on_part = fail_on_part
+
+    def write(self, table_name: str, part: int, columns: Dict[str, list]):
+        if part == self.fail_on_part:
+            raise KeyboardInterrupt
+        self.parts[table_name][part] = columns
+
+    def column(self, table_name: str, column: str) -> list:
+        return [value for part in sorted(self.parts[table_name]) for value in self.parts[table_name][part][column]]
+
+
+class TestExportHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.model = BetOnFlybyModel()
+        self.output_dir = tempfile.mkdtemp()
+        self.creator = bytes(20)
+        self.invoked_methods = []
+
+    def _invoke(self, method: str, *args):
+        self.invoked_methods.append(method)
+        outcome = self.model.apply(Operation(method, list(args), None, 0))
+        self.assertTrue(outcome.success, outcome.error)
+        return outcome.result
+
+    def _create_pools(self, count: int) -> List[bytes]:
+        pool_ids = []
+        for index in range(len(self.model.pools), len(self.model.pools) + count):
+            arguments = [self.creator, f'Pool {index}', ['yes', 'no']]
+            operation = Operation('create_pool', arguments, self.creator, 0)
+            pool_ids.append(self.model.apply(operation).result)
+        return pool_ids
+
+    def test_export_pools_and_bets(self):
+        pool_ids = self._create_pools(5)
+        player = bytes(range(20))
+        self.model.apply(Operation('bet', [player, pool_ids[1], 'yes'], player, PRICE_IN_GAS))
+        self.model.apply(Operation('finish_pool', [pool_ids[1], ['yes']], self.creator, 0))
+        self.model.apply(Operation('cancel_pool', [pool_ids[2]], self.creator, 0))
+
+        writer = MemoryWriter()
+        exported_pages = HistoryExporter(self._invoke, writer, self.output_dir, page_size=2).export()
+
+        self.assertEqual(3, exported_pages)
+        # a single read per page
+        self.assertEqual(['list_pools'] * 3, self.invoked_methods)
+        self.assertEqual([pool_id.hex() for pool_id in pool_ids], writer.column('pools', 'pool_id'))
+        self.assertEqual(['open', 'finished', 'cancelled', 'open', 'open'], writer.column('pools', 'status'))
+        self.assertEqual([None, ['yes'], None, None, None], writer.column('pools', 'winner_options'))
+        self.assertEqual([pool_ids[1].hex()], writer.column('bets', 'pool_id'))
+        self.assertEqual([player.hex()], writer.column('bets', 'player'))
+
+    def test_export_resumes_after_interruption(self):
+        pool_ids = self._create_pools(5)
+
+        with self.assertRaises(KeyboardInterrupt):
+            HistoryExporter(self._invoke, MemoryWriter(fail_on_part=1), self.output_dir, page_size=2).export()
+
+        writer = MemoryWriter()
+        self.assertEqual(2, HistoryExporter(self._invoke, writer, self.output_dir, page_size=2).export())
+        self.assertEqual([1, 2], sorted(writer.parts['pools']))
+        self.assertEqual([pool_id.hex() for pool_id in pool_ids[2:]], writer.column('pools', 'pool_id'))
+
+    def test_export_is_incremental(self):
+        pool_ids = self._create_pools(3)
+        self.model.apply(Operation('finish_pool', [pool_ids[0], ['yes']], self.creator, 0))
+        self.model.apply(Operation('cancel_pool', [pool_ids[1]], self.creator, 0))
+        HistoryExporter(self._invoke, MemoryWriter(), self.output_dir, page_size=2).export()
+
+        new_pool_ids = self._create_pools(2)
+        writer = MemoryWriter()
+        HistoryExporter(self._invoke, writer, self.output_dir, page_size=2).export()
+
+        # the first page has no open pool, the page that wasn't full is exported again with the new pool
+        self.assertEqual([1, 2], sorted(writer.parts['pools']))
+        self.assertEqual(new_pool_ids[1].hex(), writer.column('pools', 'pool_id')[-1])
+
+    def test_export_follows_open_pools(self):
+        pool_ids = self._create_pools(4)
+        self.model.apply(Operation('finish_pool', [pool_ids[2], ['yes']], self.creator, 0))
+        self.model.apply(Operation('finish_pool', [pool_ids[3], ['no']], self.creator, 0))
+        HistoryExporter(self._invoke, MemoryWriter(), self.output_dir, page_size=2).export()
+
+        player = bytes(range(20))
+        self.model.apply(Operation('bet', [player, pool_ids[0], 'yes'], player, PRICE_IN_GAS))
+        self.model.apply(Operation('finish_pool', [pool_ids[0], ['yes']], self.creator, 0))
+        writer = MemoryWriter()
+        HistoryExporter(self._invoke, writer, self.output_dir, page_size=2).export()
+
+        # the export starts again at the first page, it still had open pools
+        self.assertEqual([0, 1], sorted(writer.parts['pools']))
+        self.assertEqual(['finished', 'open', 'finished', 'finished'], writer.column('pools', 'status'))
+        self.assertEqual([player.hex()], writer.column('bets', 'player'))
+
+    def test_export_fail_different_page_size(self):
+        self._create_pools(3)
+        HistoryExporter(self._invoke, MemoryWriter(), self.output_dir, page_size=2).export()
+
+        with self.assertRaises(ValueError):
+            HistoryExporter(self._invoke, MemoryWriter(), self.output_dir, page_size=3).export()
+
+    def test_rpc_pool_is_normalized(self):
+        def byte_string(value: bytes) -> dict:
+            return {'type': 'ByteString', 'value': base64.b64encode(value).decode('ascii')}
+
+        stack_item = {'type': 'Array', 'value': [
+            byte_string(bytes(32)),
+            byte_string(bytes(20)),
+            byte_string(b'Bet for testing'),
+            {'type': 'Array', 'value': [byte_string(b'yes'), byte_string(b'no')]},
+            {'type': 'Any'},
+            {'type': 'Map', 'value': [{'key': byte_string(bytes(range(20))), 'value': byte_string(b'yes')}]},
+        ]}
+
+        pool = normalize_rpc_pool(stack_item_value(stack_item))
+        self.assertEqual([bytes(32), bytes(20), 'Bet for testing', ['yes', 'no'], None, {bytes(range(20)): 'yes'}],
+                         pool)
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), 'pyarrow is needed to write the files')
+    def test_columnar_writer(self):
+        import pyarrow.ipc
+        import pyarrow.parquet
+
+        pool_ids = self._create_pools(2)
+        player = bytes(range(20))
+        self.model.apply(Operation('bet', [player, pool_ids[0], 'yes'], player, PRICE_IN_GAS))
+        pool_columns, bet_columns = pool_tables(self._invoke('list_pools', 0, 2))
+
+        ColumnarWriter(self.output_dir).write('pools', 0, pool_columns)
+        table = pyarrow.parquet.read_table(os.path.join(self.output_dir, 'pools', 'part-000000.parquet'))
+        self.assertEqual(pool_columns, table.to_pydict())
+
+        ColumnarWriter(self.output_dir, 'arrow').write('bets', 0, bet_columns)
+        with pyarrow.ipc.open_file(os.path.join(self.output_dir, 'bets', 'part-000000.arrow')) as reader:
+            self.assertEqual(bet_columns, reader.read_all().to_pydict())
+
+        with self.assertRaises(ValueError):
+            ColumnarWriter(self.output_dir, 'csv')
@@ -0,0 +1,75 @@
+import os.path
+import sys
+import tempfile
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.load_generator import (OperationResult, PoolRef, load_workload, percentile, replay, save_workload,
+                                  summarize, synthesize_workload)
+from tools.reference_model import CREATE_POOL_METHODS, BetOnFlybyModel, Operation, Outcome
+
+
+class ModelRunner:
+    def __init__(self):
+        self.model = BetOnFlybyModel()
+
+    def apply(self, operation: Operation) -> Outcome:
+        return self.model.apply(operation)
+
+
+class TestLoadGenerator(unittest.TestCase):
+
+    def test_same_seed_same_workload(self):
+        self.assertEqual(synthesize_workload(7, pools=10, players=50, bets=300),
+                         synthesize_workload(7, pools=10, players=50, bets=300))
+        self.assertNotEqual(synthesize_workload(7, pools=10, players=50, bets=300),
+                            synthesize_workload(8, pools=10, players=50, bets=300))
+
+    def test_workload_shape(self):
+        workload = synthesize_workload(1, pools=20, players=100, bets=1000)
+        methods = [operation.method for operation in workload]
+        self.assertEqual(20, sum(1 for method in methods if method in CREATE_POOL_METHODS))
+        self.assertEqual(1000, methods.count('bet'))
+        self.assertGreater(methods.count('cancel_player_bet'), 0)
+
+        # the bets go mostly to a few popular pools
+        bets_per_pool = [0] * 20
+        for operation in workload:
+            if operation.method == 'bet':
+                bets_per_pool[operation.args[1].index] += 1
+        self.assertGreater(sum(sorted(bets_per_pool)[-5:]), 500)
+
+    def test_replay_succeeds(self):
+        workload = synthesize_workload(3, pools=10, players=50, bets=300)
+        results = replay(workload, ModelRunner())
+
+        self.assertEqual(len(workload), len(results))
+        self.assertTrue(all(result.success for result in results))
+        self.assertEqual(300, summarize(results)['bet']['count'])
+
+    def test_workload_round_trip(self):
+        workload = synthesize_workload(5, pools=5, players=20, bets=50)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'workload.jsonl')
+            save_workload(path, workload, {'seed': 5})
+            header, loaded = load_workload(path)
+
+        self.assertEqual(5, header['seed'])
+        self.assertEqual(workload, loaded)
+        first_bet = next(operation for operation in loaded if operation.method == 'bet')
+        self.assertIsInstance(first_bet.args[1], PoolRef)
+        tagged_pool = next(operation for operation in loaded if operation.method == 'create_pool_with_settings')
+        self.assertIsInstance(tagged_pool.args[3]['tags'], list)
+
+    def test_gas_percentiles(self):
+        self.assertEqual(50, percentile(list(range(1, 101)), 50))
+        self.assertEqual(99, percentile(list(range(1, 101)), 99))
+        self.assertEqual(7, percentile([7], 90))
+
+        results = [OperationResult('bet', True, None, gas, 0.1) for gas in range(1, 11)]
+        results.append(OperationResult('bet', False, 'Pool is full', 1000, 0.1))
+        summary = summarize(results)['bet']
+        self.assertEqual(1, summary['failures'])
+        self.assertEqual(5, summary['gas_p50'])
+        self.assertEqual(10, summary['gas_max'])
@@ -0,0 +1,124 @@
+import ast
+import importlib.util
+import os.path
+import sys
+import tempfile
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.build_debug import CONTRACT_PATH, SMART_CONTRACT_DIR, build_debug_contract, instrument_source
+from tools.profile_report import ProfileReport, profile_sample_pool
+
+
+class TestProfiling(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open(CONTRACT_PATH) as source_file:
+            cls.source = source_file.read()
+        cls.debug_source = instrument_source(cls.source)
+        cls.debug_module = ast.parse(cls.debug_source)
+
+    def _function(self, name: str) -> ast.FunctionDef:
+        for node in self.debug_module.body:
+            if isinstance(node, ast.FunctionDef) and node.name == name:
+                return node
+        self.fail(f'{name} is not defined in the debug contract')
+
+    def test_release_source_is_not_instrumented(self):
+        self.assertNotIn('profile_count', self.source)
+        self.assertNotIn('emit_profile', self.source)
+
+    def test_public_methods_are_wrapped(self):
+        wrapper = self._function('get_pool')
+        implementation = self._function('get_pool_impl')
+
+        self.assertEqual(['public'], [ast.unparse(decorator) for decorator in wrapper.decorator_list])
+        self.assertEqual([], implementation.decorator_list)
+        self.assertEqual(ast.unparse(wrapper.args), ast.unparse(implementation.args))
+        self.assertIn("emit_profile('get_pool')", ast.unparse(wrapper))
+
+    def test_failed_invocations_are_profiled(self):
+        bet = self._function('bet')
+        self.assertIsInstance(bet.body[0], ast.Try)
+        self.assertIn("emit_profile('bet')", ast.unparse(bet.body[0].finalbody))
+
+    def test_callbacks_are_not_wrapped(self):
+        callback = self._function('onNEP17Payment')
+        self.assertEqual(['public'], [ast.unparse(decorator) for decorator in callback.decorator_list])
+        self.assertNotIn('profile_count', ast.unparse(callback))
+        self.assertNotIn('onNEP17Payment_impl', self.debug_source)
+
+    @unittest.skipUnless(importlib.util.find_spec('boa3'), 'neo3-boa is needed to compile the debug contract')
+    def test_debug_contract_builds(self):
+        from boa3_test.tests.test_classes.testengine import TestEngine
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            nef_path = build_debug_contract(output_dir)
+            report = profile_sample_pool(TestEngine(SMART_CONTRACT_DIR), nef_path, 3)
+
+        self.assertEqual(3, report['bet'].calls)
+        self.assertEqual(1, report['finish_pool'].calls)
+        self.assertGreater(report['bet'].maximum('external_calls'), 0)
+
+    def test_nested_public_calls_use_implementation(self):
+        list_pools = ast.unparse(self._function('list_on_going_pools_impl'))
+        self.assertIn('get_pool_impl(', list_pools)
+        self.assertNotIn(' get_pool(', list_pools)
+
+    def test_counters_are_placed(self):
+        get_pool = ast.unparse(self._function('get_pool_impl'))
+        self.assertIn('find(profiled_key(PROFILE_STORAGE_READS, POOL_BET_KEY + pool_id)', get_pool)
+        self.assertIn('profile_count(PROFILE_ITERATOR_STEPS, 1)', get_pool)
+
+        transfer = ast.unparse(self._function('transfer_token'))
+        self.assertIn("call_contract(profiled_contract(PROFILE_EXTERNAL_CALLS, token), 'transfer'", transfer)
+
+    def test_short_circuited_calls_are_not_counted(self):
+        # the read is counted by the call itself, so it isn't counted when the pool is refunding
+        cancel_pools = ast.unparse(self._function('cancel_pools_impl'))
+        self.assertIn('if not is_refunding and len(get(profiled_key(PROFILE_STORAGE_READS, POOL_RESULT_KEY',
+                      cancel_pools)
+        self.assertNotIn('profile_count(PROFILE_STORAGE_READS', cancel_pools)
+
+    @unittest.skipUnless(importlib.util.find_spec('boa3'), 'neo3-boa is needed to compile the debug contract')
+    def test_gas_bet_counts(self):
+        from boa3_test.tests.test_classes.testengine import TestEngine
+
+        engine = TestEngine(SMART_CONTRACT_DIR)
+        creator = bytes(20)
+        player = bytes(range(20))
+        with tempfile.TemporaryDirectory() as output_dir:
+            nef_path = build_debug_contract(output_dir)
+            engine.add_signer_account(creator)
+            pool_id = engine.run(nef_path, 'create_pool', creator, 'Profiled pool', ['choice1', 'choice2'])
+            engine.add_gas(player, 1 * 10 ** 8)
+            engine.add_signer_account(player)
+            engine.run(nef_path, 'bet', player, pool_id, 'choice1')
+
+            report = ProfileReport()
+            report.add_engine_run(engine)
+
+        # header, result, player bet, options, bet count and total stake; the token isn't read for GAS
+        self.assertEqual(1, report['bet'].calls)
+        self.assertEqual(6, report['bet'].maximum('storage_reads'))
+        self.assertEqual(3, report['bet'].maximum('storage_writes'))
+        self.assertEqual(0, report['bet'].maximum('iterator_steps'))
+        self.assertEqual(1, report['bet'].maximum('external_calls'))
+
+    def test_report_aggregates_per_method(self):
+        report = ProfileReport()
+        report.add_event(['bet', 5, 2, 0, 1])
+        report.add_event([b'bet', 7, 2, 0, 1])
+        report.add_event(['get_pool', 5, 0, 3, 0])
+
+        self.assertEqual(['bet', 'get_pool'], [profile.method for profile in report.methods()])
+        self.assertEqual(2, report['bet'].calls)
+        self.assertEqual(6.0, report['bet'].mean('storage_reads'))
+        self.assertEqual(7, report['bet'].maximum('storage_reads'))
+        self.assertEqual(3, report['get_pool'].maximum('iterator_steps'))
+
+        lines = report.format().splitlines()
+        self.assertEqual(3, len(lines))
+        self.assertTrue(lines[1].startswith('bet '))
@@ -0,0 +1,244 @@
+import os.path
+import sys
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.reference_model import (CANCELLED_RESULT, CONTRACT_OWNER, GAS_TOKEN, NEO_TOKEN, PRICE_IN_GAS,
+                                   REVEAL_WINDOW_BLOCKS,
+                                   BetOnFlybyModel, Operation, bet_commitment)
+
+
+class TestReferenceModel(unittest.TestCase):
+
+    def setUp(self):
+        self.model = BetOnFlybyModel()
+        self.creator = bytes(20)
+        self.options = ['choice1', 'choice2', 'choice3']
+
+    def _create_pool_operation(self, description: str = 'Bet for testing', **settings) -> Operation:
+        if len(settings) == 0:
+            return Operation('create_pool', [self.creator, description, self.options], self.creator, 0)
+        return Operation('create_pool_with_settings', [self.creator, description, self.options, settings],
+                         self.creator, 0)
+
+    def _create_pool(self, **kwargs) -> bytes:
+        outcome = self.model.apply(self._create_pool_operation(**kwargs))
+        self.assertTrue(outcome.success)
+        return outcome.result
+
+    def _bet(self, pool_id: bytes, player: bytes, option: str):
+        return self.model.apply(Operation('bet', [player, pool_id, option], player, PRICE_IN_GAS))
+
+    def test_create_pool_fail_check_witness(self):
+        outcome = self.model.apply(self._create_pool_operation()._replace(signer=None))
+        self.assertFalse(outcome.success)
+        self.assertEqual('No authorization.', outcome.error)
+
+    def test_bet_moves_gas_to_contract(self):
+        pool_id = self._create_pool()
+        player = bytes(range(20))
+
+        self.assertTrue(self._bet(pool_id, player, 'choice1').success)
+        self.assertEqual(0, self.model.balances[player])
+        self.assertEqual(PRICE_IN_GAS, self.model.contract_balance)
+
+        outcome = self._bet(pool_id, player, 'choice2')
+        self.assertEqual('Only one bet is allowed per account', outcome.error)
+        self.assertEqual(PRICE_IN_GAS, self.model.balances[player])
+
+    def test_finish_pool_splits_total_stake(self):
+        pool_id = self._create_pool()
+        players = [bytes([index]) * 20 for index in range(1, 4)]
+        for player, option in zip(players, ['choice1', 'choice1', 'choice2']):
+            self._bet(pool_id, player, option)
+
+        outcome = self.model.apply(Operation('finish_pool', [pool_id, ['choice1']], self.creator, 0))
+        self.assertTrue(outcome.success)
+        prize = 3 * PRICE_IN_GAS // 2
+        self.assertEqual([prize, prize, 0], [self.model.balances[player] for player in players])
+        self.assertEqual(['choice1'], self.model.pools[pool_id].result)
+
+    def test_cancel_player_bet_keeps_fee_and_stake(self):
+        pool_id = self._create_pool()
+        player = bytes(range(20))
+        self._bet(pool_id, player, 'choice1')
+
+        outcome = self.model.apply(Operation('cancel_player_bet', [player, pool_id], player, 0))
+        self.assertTrue(outcome.success)
+        self.assertEqual(PRICE_IN_GAS * 95 // 100, self.model.balances[player])
+        self.assertEqual(PRICE_IN_GAS, self.model.pools[pool_id].total_stake)
+        self.assertEqual({}, self.model.pools[pool_id].bets)
+
+    def test_payout_fails_when_contract_cannot_pay(self):
+        pool_id = self._create_pool()
+        players = [bytes([index]) * 20 for index in range(1, 3)]
+        for player in players:
+            self._bet(pool_id, player, 'choice1')
+        self.model.apply(Operation('cancel_player_bet', [players[0], pool_id], players[0], 0))
+
+        # the cancelled stake is still in the pool total, but was mostly refunded already
+        outcome = self.model.apply(Operation('cancel_pool', [pool_id], self.creator, 0))
+        self.assertTrue(outcome.success)
+        self.assertEqual(CANCELLED_RESULT, self.model.pools[pool_id].result)
+
+        other_pool = self._create_pool()
+        self._bet(other_pool, players[0], 'choice1')
+        self._bet(other_pool, players[1], 'choice1')
+        self.model.apply(Operation('cancel_player_bet', [players[0], other_pool], players[0], 0))
+        balance = self.model.contract_balance
+        outcome = self.model.apply(Operation('finish_pool', [other_pool, ['choice1']], self.creator, 0))
+        self.assertFalse(outcome.success)
+        self.assertEqual('GAS transfer was not successful', outcome.error)
+        self.assertEqual(balance, self.model.contract_balance)
+        self.assertIsNone(self.model.pools[other_pool].result)
+
+    def test_list_pools_by_tag_pages(self):
+        pool_ids = []
+        for index in range(3):
+            pool_ids.append(self._create_pool(description=f'Pool {index}', tags=['sports']))
+        self._create_pool(description='Other', tags=['sportsman'])
+
+        first_page = self.model.apply(Operation('list_pools_by_tag', ['sports', 0, 2], None, 0)).result
+        second_page = self.model.apply(Operation('list_pools_by_tag', ['sports', 1, 2], None, 0)).result
+        self.assertEqual(sorted(pool_ids), [pool[0] for pool in first_page + second_page])
+
+        outcome = self.model.apply(Operation('list_pools_by_tag', ['sports', 0, 21], None, 0))
+        self.assertEqual('Invalid page', outcome.error)
+        outcome = self.model.apply(Operation('list_pools_by_tag', ['', 0, 2], None, 0))
+        self.assertEqual('Invalid tag', outcome.error)
+
+    def test_pool_keeps_economics_of_its_creation(self):
+        micro_pool = self._create_pool(stake=1000, cancel_fee_percent=10)
+        outcome = self.model.apply(Operation('set_economics', [2 * PRICE_IN_GAS, 0], CONTRACT_OWNER, 0))
+        self.assertTrue(outcome.success)
+        default_pool = self._create_pool()
+
+        self.assertEqual([1000, 10, 100, 0, GAS_TOKEN], self.model.get_pool_header(set(), micro_pool))
+        self.assertEqual([2 * PRICE_IN_GAS, 0, 100, 0, GAS_TOKEN],
+                         self.model.get_pool_header(set(), default_pool))
+
+        player = bytes(range(20))
+        self.model.apply(Operation('bet', [player, micro_pool, 'choice1'], player, 1000))
+        self.model.apply(Operation('cancel_player_bet', [player, micro_pool], player, 0))
+        self.assertEqual(900, self.model.balances[player])
+
+        outcome = self.model.apply(self._create_pool_operation(stake=0))
+        self.assertEqual('Invalid pool economics', outcome.error)
+
+    def test_commit_reveal_pool(self):
+        pool_id = self._create_pool(commit_reveal=True)
+        players = [bytes([index]) * 20 for index in range(1, 5)]
+        salts = [bytes([index]) * 16 for index in range(1, 5)]
+        options = ['choice1', 'choice1', 'choice2', 'choice3']
+
+        self.assertEqual('Bets on this pool must be committed', self._bet(pool_id, bytes(range(20)), 'choice1').error)
+        for player, option, salt in zip(players, options, salts):
+            commitment = bet_commitment(pool_id, player, option, salt)
+            outcome = self.model.apply(Operation('commit_bet', [player, pool_id, commitment], player, PRICE_IN_GAS))
+            self.assertTrue(outcome.success)
+        # the bets stay hidden until they are revealed
+        self.assertEqual({}, self.model.pools[pool_id].bets)
+
+        outcome = self.model.apply(Operation('finish_pool', [pool_id, ['choice1']], self.creator, 0))
+        self.assertEqual('Bets are not being revealed', outcome.error)
+        self.assertTrue(self.model.apply(Operation('start_reveal', [pool_id], self.creator, 0)).success)
+
+        # a wrong salt, a malformed reveal and the last player's bet are not revealed
+        reveals = [[player, option, salt] for player, option, salt in zip(players[:3], options, salts)]
+        reveals.append([players[3], options[3], bytes(16)])
+        reveals.extend([[players[3], options[3]], [players[3][:10], options[3], salts[3]]])
+        outcome = self.model.apply(Operation('reveal_bets', [pool_id, reveals], None, 0))
+        self.assertEqual(3, outcome.result)
+        self.assertEqual({'choice1': 2, 'choice2': 1, 'choice3': 0},
+                         self.model.apply(Operation('get_option_counts', [pool_id], None, 0)).result)
+
+        # the last player has until the deadline to reveal
+        outcome = self.model.apply(Operation('finish_pool', [pool_id, ['choice1']], self.creator, 0))
+        self.assertEqual('Bets are still being revealed', outcome.error)
+        self.model.block_height += REVEAL_WINDOW_BLOCKS
+
+        outcome = self.model.apply(Operation('finish_pool', [pool_id, ['choice1']], self.creator, 0))
+        self.assertTrue(outcome.success)
+        self.assertEqual([2 * PRICE_IN_GAS, 2 * PRICE_IN_GAS, 0, 0],
+                         [self.model.balances[player] for player in players])
+
+    def test_pool_in_other_token(self):
+        outcome = self.model.apply(self._create_pool_operation('NEO pool', stake=2, token=NEO_TOKEN))
+        self.assertEqual('Token is not accepted', outcome.error)
+
+        outcome = self.model.apply(Operation('set_token_accepted', [NEO_TOKEN, True], CONTRACT_OWNER, 0))
+        self.assertTrue(outcome.success)
+        outcome = self.model.apply(self._create_pool_operation('NEO pool', token=NEO_TOKEN))
+        self.assertEqual('Invalid pool economics', outcome.error)
+        pool_id = self._create_pool(description='NEO pool', stake=2, token=NEO_TOKEN)
+
+        players = [bytes([index]) * 20 for index in range(1, 3)]
+        for player, option in zip(players, ['choice1', 'choice2']):
+            self.model.token_balances.setdefault(NEO_TOKEN, {})[player] = 2
+            self.assertTrue(self._bet(pool_id, player, option).success)
+
+        self.model.apply(Operation('finish_pool', [pool_id, ['choice1']], self.creator, 0))
+        self.assertEqual({players[0]: 4, players[1]: 0}, self.model.token_balances[NEO_TOKEN])
+        self.assertEqual(0, self.model.contract_balance)
+        self.assertEqual(4, self.model.apply(Operation('get_token_volume', [NEO_TOKEN], None, 0)).result)
+
+    def test_cancel_pools_pending_only_with_bets_left(self):
+        pool_ids = [self._create_pool(description=f'Pool {index}') for index in range(2)]
+        players = [bytes([index]) * 20 for index in range(1, 3)]
+        for pool_id in pool_ids:
+            for player in players:
+                self._bet(pool_id, player, 'choice1')
+
+        # the first pool fills the batch exactly, the second one is listed once
+        outcome = self.model.apply(Operation('cancel_pools', [[pool_ids[0], pool_ids[1], pool_ids[1]], 2],
+                                             CONTRACT_OWNER, 0))
+        self.assertEqual([pool_ids[1]], outcome.result)
+        self.assertFalse(self.model.pools[pool_ids[0]].refunding)
+
+        outcome = self.model.apply(Operation('cancel_pools', [[pool_ids[1], pool_ids[1]], 2], CONTRACT_OWNER, 0))
+        self.assertEqual([], outcome.result)
+
+    def test_pool_in_delisted_token(self):
+        self.model.apply(Operation('set_token_accepted', [NEO_TOKEN, True], CONTRACT_OWNER, 0))
+        pool_id = self._create_pool(description='NEO pool', stake=2, token=NEO_TOKEN)
+        self.model.apply(Operation('set_token_accepted', [NEO_TOKEN, False], CONTRACT_OWNER, 0))
+
+        player = bytes([1]) * 20
+        self.model.token_balances.setdefault(NEO_TOKEN, {})[player] = 2
+        outcome = self._bet(pool_id, player, 'choice1')
+        self.assertEqual('Token is not accepted', outcome.error)
+        self.assertEqual(2, self.model.token_balances[NEO_TOKEN][player])
+
+    def test_cancel_pools_in_batches(self):
+        pool_ids = [self._create_pool(description=f'Pool {index}') for index in range(3)]
+        players = [bytes([index]) * 20 for index in range(1, 4)]
+        for pool_id in pool_ids:
+            for player in players:
+                self._bet(pool_id, player, 'choice1')
+        self.model.apply(Operation('finish_pool', [pool_ids[2], ['choice1']], self.creator, 0))
+        balances = [self.model.balances[player] for player in players]
+
+        outcome = self.model.apply(Operation('cancel_pools', [pool_ids, 4], self.creator, 0))
+        self.assertEqual('No authorization.', outcome.error)
+        outcome = self.model.apply(Operation('cancel_pools', [pool_ids, 0], CONTRACT_OWNER, 0))
+        self.assertEqual('Invalid batch size', outcome.error)
+
+        # the refunds of both pools to the first player are paid together
+        outcome = self.model.apply(Operation('cancel_pools', [pool_ids, 4], CONTRACT_OWNER, 0))
+        self.assertEqual(pool_ids[1:2], outcome.result)
+        self.assertEqual([balances[0] + 2 * PRICE_IN_GAS, balances[1] + PRICE_IN_GAS, balances[2] + PRICE_IN_GAS],
+                         [self.model.balances[player] for player in players])
+        self.assertEqual(CANCELLED_RESULT, self.model.pools[pool_ids[1]].result)
+        self.assertEqual(['choice1'], self.model.pools[pool_ids[2]].result)
+
+        outcome = self.model.apply(Operation('cancel_pools', [pool_ids, 4], CONTRACT_OWNER, 0))
+        self.assertEqual([], outcome.result)
+        self.assertEqual([balance + 2 * PRICE_IN_GAS for balance in balances],
+                         [self.model.balances[player] for player in players])
+        # the bets stay in the pool history, but aren't refunded twice
+        self.assertEqual({player: 'choice1' for player in players}, self.model.pools[pool_ids[1]].bets)
+        outcome = self.model.apply(Operation('cancel_pools', [pool_ids, 4], CONTRACT_OWNER, 0))
+        self.assertEqual([], outcome.result)
+        self.assertEqual([balance + 2 * PRICE_IN_GAS for balance in balances],
+                         [self.model.balances[player] for player in players])
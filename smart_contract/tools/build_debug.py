@@ -0,0 +1,234 @@
+"""
+Builds the profiling variant of the BetOnFlyby contract.
+
+The release source is never changed: this script rewrites a copy of it so that every
+public method emits a ``Profile`` event with the number of storage reads, storage writes,
+iterator steps and external contract calls made during the invocation, and compiles the
+copy to ``build/BetOnFlybyDebug.nef``.
+
+The event is emitted in a ``finally`` block, so an invocation that raises still reports
+what it did before failing. An invocation that runs out of GAS is stopped by the VM
+without running it: replay those with a higher GAS limit to see their counters.
+
+Usage: python tools/build_debug.py [output_dir]
+"""
+import ast
+import os
+import sys
+from typing import List, Set
+
+STORAGE_READS = 0
+STORAGE_WRITES = 1
+ITERATOR_STEPS = 2
+EXTERNAL_CALLS = 3
+
+PROFILE_EVENT_NAME = 'Profile'
+
+COUNTER_NAMES = ['PROFILE_STORAGE_READS', 'PROFILE_STORAGE_WRITES', 'PROFILE_ITERATOR_STEPS', 'PROFILE_EXTERNAL_CALLS']
+
+COUNTED_CALLS = {
+    'get': STORAGE_READS,
+    'find': STORAGE_READS,
+    'put': STORAGE_WRITES,
+    'delete': STORAGE_WRITES,
+    'call_contract': EXTERNAL_CALLS,
+}
+
+# the first argument of each counted call goes through a helper that counts it and returns it
+# unchanged, so a call is counted only when it runs, not when a condition short-circuits it
+COUNTING_HELPERS = {
+    'call_contract': 'profiled_contract',
+}
+DEFAULT_COUNTING_HELPER = 'profiled_key'
+
+PROFILE_PRELUDE = '''
+on_profile = CreateNewEvent([('method', str),
+                             ('storage_reads', int),
+                             ('storage_writes', int),
+                             ('iterator_steps', int),
+                             ('external_calls', int)],
+                            'Profile')
+
+PROFILE_STORAGE_READS = 0
+PROFILE_STORAGE_WRITES = 1
+PROFILE_ITERATOR_STEPS = 2
+PROFILE_EXTERNAL_CALLS = 3
+
+PROFILE_COUNTERS = [0, 0, 0, 0]
+
+
+def profile_count(counter: int, amount: int):
+    PROFILE_COUNTERS[counter] = PROFILE_COUNTERS[counter] + amount
+
+
+def profiled_key(counter: int, key: bytes) -> bytes:
+    profile_count(counter, 1)
+    return key
+
+
+def profiled_contract(counter: int, script_hash: UInt160) -> UInt160:
+    profile_count(counter, 1)
+    return script_hash
+
+
+def emit_profile(method: str):
+    on_profile(method,
+               PROFILE_COUNTERS[PROFILE_STORAGE_READS],
+               PROFILE_COUNTERS[PROFILE_STORAGE_WRITES],
+               PROFILE_COUNTERS[PROFILE_ITERATOR_STEPS],
+               PROFILE_COUNTERS[PROFILE_EXTERNAL_CALLS])
+'''
+
+# callbacks run in a context of their own when another contract calls them, so they'd
+# report separately from the method that made the call
+UNPROFILED_METHODS = {'onNEP17Payment'}
+
+SMART_CONTRACT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONTRACT_PATH = os.path.join(SMART_CONTRACT_DIR, 'src', 'BetOnFlyby.py')
+DEFAULT_OUTPUT_DIR = os.path.join(SMART_CONTRACT_DIR, 'build')
+
+
+def is_public(function: ast.FunctionDef) -> bool:
+    for decorator in function.decorator_list:
+        if isinstance(decorator, ast.Call):
+            decorator = decorator.func
+        if isinstance(decorator, ast.Name) and decorator.id == 'public':
+            return True
+    return False
+
+
+def impl_name(method: str) -> str:
+    return method + '_impl'
+
+
+def _iterates(loop: ast.While) -> bool:
+    return any(isinstance(child, ast.Call) and isinstance(child.func, ast.Attribute) and child.func.attr == 'next'
+               for child in ast.walk(loop.test))
+
+
+def _count_statement(counter: int, amount: int) -> ast.stmt:
+    return ast.parse(f'profile_count({COUNTER_NAMES[counter]}, {amount})').body[0]
+
+
+class _RedirectPublicCalls(ast.NodeTransformer):
+    """Internal calls to public methods go straight to their implementation, so nested
+    calls add to the caller's counters instead of emitting events of their own."""
+
+    def __init__(self, public_methods: Set[str]):
+        self.public_methods = public_methods
+
+    def visit_Call(self, node: ast.Call) -> ast.Call:
+        self.generic_visit(node)
+        if isinstance(node.func, ast.Name) and node.func.id in self.public_methods:
+            node.func = ast.Name(id=impl_name(node.func.id), ctx=ast.Load())
+        return node
+
+
+class _CountCalls(ast.NodeTransformer):
+    """Passes the first argument of the counted calls through their counting helper."""
+
+    def visit_Call(self, node: ast.Call) -> ast.Call:
+        self.generic_visit(node)
+        if isinstance(node.func, ast.Name) and node.func.id in COUNTED_CALLS and len(node.args) > 0:
+            helper = COUNTING_HELPERS.get(node.func.id, DEFAULT_COUNTING_HELPER)
+            counter = ast.Name(id=COUNTER_NAMES[COUNTED_CALLS[node.func.id]], ctx=ast.Load())
+            node.args[0] = ast.Call(func=ast.Name(id=helper, ctx=ast.Load()), args=[counter, node.args[0]],
+                                    keywords=[])
+        return node
+
+
+def _count_iterator_steps(body: List[ast.stmt]) -> List[ast.stmt]:
+    for statement in body:
+        if isinstance(statement, (ast.If, ast.While, ast.For)):
+            statement.body = _count_iterator_steps(statement.body)
+            statement.orelse = _count_iterator_steps(statement.orelse)
+            if isinstance(statement, ast.While) and _iterates(statement):
+                statement.body.insert(0, _count_statement(ITERATOR_STEPS, 1))
+    return body
+
+
+def _profiled_wrapper(function: ast.FunctionDef) -> ast.FunctionDef:
+    decorators = ''.join(f'@{ast.unparse(decorator)}\n' for decorator in function.decorator_list)
+    arguments = ', '.join(argument.arg for argument in function.args.args)
+    call = f'{impl_name(function.name)}({arguments})'
+
+    if function.returns is None:
+        returns = ''
+        body = f'    try:\n' \
+               f'        {call}\n' \
+               f'    finally:\n' \
+               f'        emit_profile({function.name!r})\n'
+    else:
+        returns = f' -> {ast.unparse(function.returns)}'
+        body = f'    try:\n' \
+               f'        result = {call}\n' \
+               f'    finally:\n' \
+               f'        emit_profile({function.name!r})\n' \
+               f'    return result\n'
+
+    source = f'{decorators}def {function.name}({ast.unparse(function.args)}){returns}:\n{body}'
+    return ast.parse(source).body[0]
+
+
+def instrument_source(source: str) -> str:
+    """
+    Returns the profiling variant of a contract source.
+
+    Each public method is renamed to ``<method>_impl`` and replaced by a public wrapper
+    with the same signature that calls it and then emits the ``Profile`` event, even when
+    it raises. The callbacks in ``UNPROFILED_METHODS`` are left as they are.
+    """
+    module = ast.parse(source)
+    functions = [node for node in module.body if isinstance(node, ast.FunctionDef)]
+    public_methods = {function.name for function in functions
+                      if is_public(function) and function.name not in UNPROFILED_METHODS}
+
+    redirect = _RedirectPublicCalls(public_methods)
+    count_calls = _CountCalls()
+    new_body: List[ast.stmt] = []
+    prelude_added = False
+    for node in module.body:
+        if not prelude_added and not isinstance(node, (ast.Import, ast.ImportFrom)):
+            new_body.extend(ast.parse(PROFILE_PRELUDE).body)
+            prelude_added = True
+
+        if not isinstance(node, ast.FunctionDef) or node.name in UNPROFILED_METHODS:
+            new_body.append(node)
+            continue
+
+        redirect.visit(node)
+        count_calls.visit(node)
+        node.body = _count_iterator_steps(node.body)
+        if node.name in public_methods:
+            wrapper = _profiled_wrapper(node)
+            node.name = impl_name(node.name)
+            node.decorator_list = []
+            new_body.extend([node, wrapper])
+        else:
+            new_body.append(node)
+
+    module.body = new_body
+    return ast.unparse(ast.fix_missing_locations(module)) + '\n'
+
+
+def build_debug_contract(output_dir: str = DEFAULT_OUTPUT_DIR, source_path: str = CONTRACT_PATH) -> str:
+    """Writes the profiling source to ``output_dir``, compiles it and returns the nef path."""
+    from boa3.boa3 import Boa3
+
+    with open(source_path) as source_file:
+        source = source_file.read()
+
+    os.makedirs(output_dir, exist_ok=True)
+    contract_name = os.path.splitext(os.path.basename(source_path))[0]
+    debug_path = os.path.join(output_dir, f'{contract_name}Debug.py')
+    with open(debug_path, 'w') as debug_file:
+        debug_file.write(instrument_source(source))
+
+    nef_path = debug_path.replace('.py', '.nef')
+    Boa3.compile_and_save(debug_path, output_path=nef_path)
+    return nef_path
+
+
+if __name__ == '__main__':
+    output = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_OUTPUT_DIR
+    print(build_debug_contract(output))
@@ -0,0 +1,201 @@
+"""
+Fans the pool changes of the contract out to websocket subscribers.
+
+The service follows the contract log of Dora, and every ``ChangeImage`` notification names
+the pool that changed and how. The pool is read once with ``get_pool`` and the delta is
+pushed to the subscribers of that pool, so clients patch the pool they show instead of
+listing every pool again after each bet.
+
+A subscriber that falls behind only keeps the latest delta of each pool, so a slow client
+costs bounded memory and never receives an outdated pool after a newer one. A pool that
+can't be read, because the node failed or the pool doesn't exist, is logged and skipped.
+
+Clients connect and may send ``{"subscribe": ["<pool id hex>", ...]}`` to receive the
+changes of those pools only; without it they receive every change. Each delta is sent as
+``{"pool_id": ..., "kind": ..., "pool": {...}}``.
+
+Serving needs the ``websockets`` package; the feed itself runs on plain ``asyncio`` and can
+be driven by any source of log messages, like the local stand-in of the tests.
+
+Usage: python tools/change_feed.py [--host HOST] [--port PORT] [--rpc URL] [--contract HASH]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+from collections import OrderedDict, namedtuple
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Set
+
+if __name__ == '__main__':
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.export_history import DEFAULT_CONTRACT, DEFAULT_RPC_URL, rpc_invoke, stack_item_value
+
+CHANGE_EVENT_NAME = 'ChangeImage'
+DORA_LOG_URL = 'wss://dora.coz.io/ws/v1/neo3/testnet/log/{contract}'
+
+PoolChange = namedtuple('PoolChange', ['pool_id', 'kind'])
+
+logger = logging.getLogger(__name__)
+
+
+def parse_changes(message: Dict[str, Any]) -> List[PoolChange]:
+    """Returns the pool changes notified in a message of the Dora contract log."""
+    log = message.get('log')
+    if not log:
+        return []
+
+    changes = []
+    for notification in log.get('notifications', []):
+        if notification.get('event_name') != CHANGE_EVENT_NAME:
+            continue
+
+        state = notification['state']
+        arguments = stack_item_value(state) if isinstance(state, dict) else [stack_item_value(item) for item in state]
+        if len(arguments) < 3:
+            # emitted before the events carried the pool
+            continue
+
+        pool_id, kind = arguments[1], arguments[2]
+        changes.append(PoolChange(pool_id, kind.decode('utf-8') if isinstance(kind, bytes) else kind))
+    return changes
+
+
+def pool_to_json(pool: list) -> Dict[str, Any]:
+    """Converts a pool in the reference model format to the JSON sent to the clients."""
+    pool_id, creator, description, options, result, bets = pool
+    return {'pool_id': pool_id.hex(),
+            'creator': creator.hex(),
+            'description': description,
+            'options': list(options),
+            'result': result,
+            'bets': {player.hex(): option for player, option in bets.items()}}
+
+
+class Subscription:
+    def __init__(self, pool_ids: Optional[Iterable[str]] = None):
+        # hex ids of the pools followed, or None for all of them
+        self.pool_ids: Optional[Set[str]] = set(pool_ids) if pool_ids is not None else None
+        self._pending: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._ready = asyncio.Event()
+
+    def wants(self, pool_id: str) -> bool:
+        return self.pool_ids is None or pool_id in self.pool_ids
+
+    def push(self, delta: Dict[str, Any]):
+        # a newer delta of the same pool replaces the one not sent yet
+        self._pending.pop(delta['pool_id'], None)
+        self._pending[delta['pool_id']] = delta
+        self._ready.set()
+
+    async def next_delta(self) -> Dict[str, Any]:
+        while len(self._pending) == 0:
+            self._ready.clear()
+            await self._ready.wait()
+        return self._pending.popitem(last=False)[1]
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+
+class ChangeFeed:
+    def __init__(self, read_pool: Callable[[bytes], list]):
+        # read_pool returns a pool in the reference model format, see export_history.Invoke
+        self.read_pool = read_pool
+        self.subscriptions: List[Subscription] = []
+
+    def subscribe(self, pool_ids: Optional[Iterable[str]] = None) -> Subscription:
+        subscription = Subscription(pool_ids)
+        self.subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscriptions.remove(subscription)
+
+    async def handle_message(self, message: Dict[str, Any]) -> int:
+        """Publishes the changes of a log message and returns how many pools were read."""
+        latest_changes: Dict[bytes, PoolChange] = {}
+        for change in parse_changes(message):
+            latest_changes[change.pool_id] = change
+
+        read_pools = 0
+        for pool_id, change in latest_changes.items():
+            if not any(subscription.wants(pool_id.hex()) for subscription in self.subscriptions):
+                continue
+
+            # read once, however many subscribers follow the pool
+            try:
+                pool = await asyncio.to_thread(self.read_pool, pool_id)
+            except Exception as error:
+                logger.warning('Skipped the %s change of pool %s: %s', change.kind, pool_id.hex(), error)
+                continue
+            read_pools += 1
+            self.publish({'pool_id': pool_id.hex(), 'kind': change.kind, 'pool': pool_to_json(pool)})
+        return read_pools
+
+    def publish(self, delta: Dict[str, Any]):
+        for subscription in self.subscriptions:
+            if subscription.wants(delta['pool_id']):
+                subscription.push(delta)
+
+    async def run(self, messages: AsyncIterator[str]):
+        async for raw_message in messages:
+            await self.handle_message(json.loads(raw_message))
+
+
+async def dora_messages(contract_hash: str) -> AsyncIterator[str]:
+    import websockets  # optional, only needed to serve
+
+    async for connection in websockets.connect(DORA_LOG_URL.format(contract=contract_hash)):
+        try:
+            async for raw_message in connection:
+                yield raw_message
+        except websockets.ConnectionClosed:
+            continue
+
+
+async def read_subscriptions(connection, subscription: Subscription):
+    async for raw_request in connection:
+        request = json.loads(raw_request)
+        if 'subscribe' in request:
+            subscription.pool_ids = set(request['subscribe'])
+
+
+async def serve_client(feed: ChangeFeed, connection):
+    subscription = feed.subscribe()
+    requests = asyncio.ensure_future(read_subscriptions(connection, subscription))
+    try:
+        while True:
+            delta = asyncio.ensure_future(subscription.next_delta())
+            await asyncio.wait([requests, delta], return_when=asyncio.FIRST_COMPLETED)
+            if requests.done():
+                # the client disconnected
+                delta.cancel()
+                return
+            await connection.send(json.dumps(delta.result()))
+    finally:
+        requests.cancel()
+        feed.unsubscribe(subscription)
+
+
+async def serve(host: str, port: int, rpc_url: str, contract_hash: str):
+    import websockets  # optional, only needed to serve
+
+    invoke = rpc_invoke(rpc_url, contract_hash)
+    feed = ChangeFeed(lambda pool_id: invoke('get_pool', pool_id))
+    async with websockets.serve(lambda connection, *_: serve_client(feed, connection), host, port):
+        await feed.run(dora_messages(contract_hash))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Pushes the pool changes of the contract to websocket clients.')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--rpc', default=DEFAULT_RPC_URL)
+    parser.add_argument('--contract', default=DEFAULT_CONTRACT)
+    arguments = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(serve(arguments.host, arguments.port, arguments.rpc, arguments.contract))
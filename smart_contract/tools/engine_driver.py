@@ -0,0 +1,68 @@
+"""
+Runs reference model operations on the compiled contract through the TestEngine.
+"""
+from boa3.neo3.vm import VMState
+
+from tools.reference_model import GAS_TOKEN, Operation, Outcome
+
+GAS_SCRIPT = GAS_TOKEN
+
+
+def as_bytes(value) -> bytes:
+    # test engine converts to string whenever is possible
+    if isinstance(value, str):
+        return value.encode('utf-8')
+    return value
+
+
+class ContractRunner:
+    def __init__(self, engine, nef_path: str):
+        self.engine = engine
+        self.nef_path = nef_path
+        # known once the engine has deployed the contract, on its first run
+        self.contract_hash = None
+
+    def apply(self, operation: Operation) -> Outcome:
+        if operation.gas > 0:
+            self.engine.add_gas(operation.signer, operation.gas)
+        if operation.signer is not None:
+            self.engine.add_signer_account(operation.signer)
+
+        result = self.engine.run(self.nef_path, operation.method, *operation.args)
+        self.contract_hash = self.engine.executed_script_hash.to_array()
+        if self.engine.vm_state == VMState.HALT:
+            return Outcome(True, result, None, self.engine.gas_consumed)
+        return Outcome(False, None, self.engine.error, self.engine.gas_consumed)
+
+    def gas_balance(self, account: bytes) -> int:
+        return self.engine.run(GAS_SCRIPT, 'balanceOf', account)
+
+    def contract_token_balance(self, token: bytes) -> int:
+        return self.engine.run(token, 'balanceOf', self.contract_hash)
+
+    def token_volume(self, token: bytes) -> int:
+        return self.engine.run(self.nef_path, 'get_token_volume', token)
+
+    def get_pool(self, pool_id: bytes) -> list:
+        pool = self.engine.run(self.nef_path, 'get_pool', pool_id)
+        if self.engine.vm_state != VMState.HALT:
+            raise AssertionError(self.engine.error)
+        return normalize_pool(pool)
+
+
+def normalize_pool(pool: list) -> list:
+    """Converts a `get_pool` result from the TestEngine to the reference model format."""
+    pool = list(pool)
+    pool[0] = as_bytes(pool[0])
+    pool[1] = as_bytes(pool[1])
+    pool[5] = {as_bytes(player): option for player, option in pool[5].items()}
+    return pool
+
+
+def normalize_compact_pool(pool: list) -> list:
+    """Converts a `get_pool_compact` result from the TestEngine to the reference model format."""
+    pool = list(pool)
+    pool[0] = as_bytes(pool[0])
+    pool[1] = as_bytes(pool[1])
+    pool[5] = [[as_bytes(player), option] for player, option in pool[5]]
+    return pool
@@ -0,0 +1,259 @@
+"""
+Exports the history of every pool and bet of the contract to columnar files.
+
+Pools are read a page at a time with ``list_pools``, one invocation per page, and each
+page is written as its own part file of the ``pools`` and ``bets`` tables, so memory stays
+bounded by the page size and the number of bets a pool can hold. The pages follow the creation
+order of the pools, and the checkpoint in ``checkpoint.json`` is saved after each one is
+written: an interrupted export resumes where it stopped.
+
+Finished and cancelled pools don't change anymore, but open pools still take bets. Each
+export starts again at the first page with an open pool, and writes the pages again under the
+same part names, so the files follow the pools until they are finished. The pools created
+before the contract numbered them are numbered when it's updated, in the order of their ids.
+
+Writing needs ``pyarrow``: the tables are written as Parquet, or as Arrow IPC files with
+``--format arrow``.
+
+Usage: python tools/export_history.py output_dir [--rpc URL] [--contract HASH]
+                                     [--format parquet|arrow] [--page-size N]
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import urllib.request
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+if __name__ == '__main__':
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.reference_model import CANCELLED_RESULT
+
+CHECKPOINT_FILE = 'checkpoint.json'
+DEFAULT_PAGE_SIZE = 20
+
+DEFAULT_RPC_URL = 'https://testnet1.neo.coz.io'
+DEFAULT_CONTRACT = '0xa9ab4ea48570270b4c4c9b47a97340f545dfd9a8'
+
+# invokes a read-only method of the contract and returns its result, with the pools in the
+# reference model format (see engine_driver.normalize_pool)
+Invoke = Callable[..., Any]
+
+
+def pool_status(result: Any) -> str:
+    if result is None:
+        return 'open'
+    if result == CANCELLED_RESULT:
+        return 'cancelled'
+    return 'finished'
+
+
+def pool_tables(pools: List[list]) -> Tuple[Dict[str, list], Dict[str, list]]:
+    """Converts `get_pool` results to the columns of the pools and bets tables."""
+    pool_columns: Dict[str, list] = {'pool_id': [], 'creator': [], 'description': [], 'options': [],
+                                     'status': [], 'winner_options': [], 'bet_count': []}
+    bet_columns: Dict[str, list] = {'pool_id': [], 'player': [], 'option': []}
+
+    for pool_id, creator, description, options, result, bets in pools:
+        status = pool_status(result)
+        pool_columns['pool_id'].append(pool_id.hex())
+        pool_columns['creator'].append(creator.hex())
+        pool_columns['description'].append(description)
+        pool_columns['options'].append(list(options))
+        pool_columns['status'].append(status)
+        pool_columns['winner_options'].append(list(result) if status == 'finished' else None)
+        pool_columns['bet_count'].append(len(bets))
+
+        for player, option in bets.items():
+            bet_columns['pool_id'].append(pool_id.hex())
+            bet_columns['player'].append(player.hex())
+            bet_columns['option'].append(option)
+
+    return pool_columns, bet_columns
+
+
+def contract_pages(invoke: Invoke, first_page: int, page_size: int) -> Iterator[Tuple[int, List[list]]]:
+    """Yields the pools of the contract page by page, starting at `first_page`."""
+    page = first_page
+    while True:
+        pools = invoke('list_pools', page, page_size)
+        if len(pools) == 0:
+            return
+
+        yield page, pools
+        if len(pools) < page_size:
+            return
+        page += 1
+
+
+class ColumnarWriter:
+    def __init__(self, output_dir: str, file_format: str = 'parquet'):
+        import pyarrow     # optional, only needed to write the files
+
+        if file_format not in ('parquet', 'arrow'):
+            raise ValueError(f'Unknown file format: {file_format}')
+        self._pyarrow = pyarrow
+        self.output_dir = output_dir
+        self.file_format = file_format
+
+    def write(self, table_name: str, part: int, columns: Dict[str, list]):
+        table = self._pyarrow.table(columns)
+        directory = os.path.join(self.output_dir, table_name)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'part-{part:06d}.{self.file_format}')
+
+        if self.file_format == 'parquet':
+            import pyarrow.parquet
+            pyarrow.parquet.write_table(table, path)
+        else:
+            import pyarrow.ipc
+            with pyarrow.ipc.new_file(path, table.schema) as writer:
+                writer.write_table(table)
+
+
+class HistoryExporter:
+    def __init__(self, invoke: Invoke, writer, output_dir: str, page_size: int = DEFAULT_PAGE_SIZE):
+        self.invoke = invoke
+        self.writer = writer
+        self.checkpoint_path = os.path.join(output_dir, CHECKPOINT_FILE)
+        self.page_size = page_size
+
+    def load_checkpoint(self) -> Optional[Dict[str, int]]:
+        if not os.path.isfile(self.checkpoint_path):
+            return None
+        with open(self.checkpoint_path) as checkpoint_file:
+            return json.load(checkpoint_file)
+
+    def save_checkpoint(self, next_page: int, open_page: Optional[int]):
+        # `open_page` is the first page of the current export with open pools, None once it's done
+        temporary_path = self.checkpoint_path + '.tmp'
+        with open(temporary_path, 'w') as checkpoint_file:
+            json.dump({'next_page': next_page, 'open_page': open_page, 'page_size': self.page_size},
+                      checkpoint_file)
+        os.replace(temporary_path, self.checkpoint_path)
+
+    def export(self) -> int:
+        """Exports the pages from the first one with open pools and returns how many were written."""
+        first_page = 0
+        open_page = None
+        checkpoint = self.load_checkpoint()
+        if checkpoint is not None:
+            if checkpoint['page_size'] != self.page_size:
+                raise ValueError(f"The export was started with pages of {checkpoint['page_size']} pools")
+            first_page = checkpoint['next_page']
+            open_page = checkpoint.get('open_page')
+
+        written_pages = 0
+        next_page = first_page
+        for page, pools in contract_pages(self.invoke, first_page, self.page_size):
+            pool_columns, bet_columns = pool_tables(pools)
+            self.writer.write('pools', page, pool_columns)
+            self.writer.write('bets', page, bet_columns)
+            written_pages += 1
+
+            # a page that isn't full yet or has open pools is read again by the next export
+            if open_page is None and (len(pools) < self.page_size or 'open' in pool_columns['status']):
+                open_page = page
+            next_page = page + 1
+            self.save_checkpoint(next_page, open_page)
+
+        self.save_checkpoint(next_page if open_page is None else open_page, None)
+        return written_pages
+
+
+def engine_invoke(engine, nef_path: str) -> Invoke:
+    from boa3.neo3.vm import VMState
+    from tools.engine_driver import as_bytes, normalize_pool
+
+    def invoke(method: str, *args):
+        result = engine.run(nef_path, method, *args)
+        if engine.vm_state != VMState.HALT:
+            raise RuntimeError(engine.error)
+        if method == 'get_pool':
+            return normalize_pool(result)
+        if method == 'list_pools':
+            return [normalize_pool(pool) for pool in result]
+        if method == 'list_pool_ids':
+            return [as_bytes(pool_id) for pool_id in result]
+        return result
+
+    return invoke
+
+
+def stack_item_value(item: Dict[str, Any]) -> Any:
+    item_type = item['type']
+    if item_type in ('Array', 'Struct'):
+        return [stack_item_value(element) for element in item['value']]
+    if item_type == 'Map':
+        return {stack_item_value(entry['key']): stack_item_value(entry['value']) for entry in item['value']}
+    if item_type in ('ByteString', 'Buffer'):
+        return base64.b64decode(item['value'])
+    if item_type == 'Integer':
+        return int(item['value'])
+    if item_type == 'Boolean':
+        return item['value']
+    return None
+
+
+def normalize_rpc_pool(pool: list) -> list:
+    pool_id, creator, description, options, result, bets = pool
+    if isinstance(result, bytes):
+        result = result.decode('utf-8')
+    elif result is not None:
+        result = [option.decode('utf-8') for option in result]
+
+    return [pool_id,
+            creator,
+            description.decode('utf-8'),
+            [option.decode('utf-8') for option in options],
+            result,
+            {player: option.decode('utf-8') for player, option in bets.items()}
+            ]
+
+
+def rpc_invoke(rpc_url: str, contract_hash: str) -> Invoke:
+    """Reads the contract with the `invokefunction` method of a node's JSON-RPC."""
+
+    def parameter(value) -> Dict[str, Any]:
+        if isinstance(value, int):
+            return {'type': 'Integer', 'value': str(value)}
+        return {'type': 'ByteArray', 'value': base64.b64encode(value).decode('ascii')}
+
+    def invoke(method: str, *args):
+        payload = {'jsonrpc': '2.0', 'id': 1, 'method': 'invokefunction',
+                   'params': [contract_hash, method, [parameter(arg) for arg in args]]}
+        request = urllib.request.Request(rpc_url, data=json.dumps(payload).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request) as response:
+            answer = json.load(response)
+
+        if 'error' in answer:
+            raise RuntimeError(answer['error'])
+        if answer['result']['state'] != 'HALT':
+            raise RuntimeError(answer['result'].get('exception'))
+
+        result = stack_item_value(answer['result']['stack'][0])
+        if method == 'get_pool':
+            return normalize_rpc_pool(result)
+        if method == 'list_pools':
+            return [normalize_rpc_pool(pool) for pool in result]
+        return result
+
+    return invoke
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Exports the pools and bets of the contract.')
+    parser.add_argument('output_dir')
+    parser.add_argument('--rpc', default=DEFAULT_RPC_URL)
+    parser.add_argument('--contract', default=DEFAULT_CONTRACT)
+    parser.add_argument('--format', default='parquet', choices=['parquet', 'arrow'])
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE)
+    arguments = parser.parse_args()
+
+    exporter = HistoryExporter(rpc_invoke(arguments.rpc, arguments.contract),
+                               ColumnarWriter(arguments.output_dir, arguments.format),
+                               arguments.output_dir, arguments.page_size)
+    print(f'{exporter.export()} pages exported')
@@ -0,0 +1,320 @@
+"""
+Deterministic load generator and replay tool for the BetOnFlyby contract.
+
+A workload is synthesized from a seed: pools are created over time, bets go mostly to a few
+popular pools and options (Zipf distributions), some bets are cancelled and the pools are
+finished or cancelled at the end. The reference model keeps the workload valid while it's
+generated, so every operation is expected to succeed.
+
+Workloads are saved as JSON lines and replayed exactly through the TestEngine, which
+records the GAS consumed by every operation. Saving the results of two contract versions
+replayed on the same workload lets them be compared method by method.
+
+Usage:
+    python tools/load_generator.py generate workload.jsonl [--seed S] [--pools N] [--players N] [--bets N]
+    python tools/load_generator.py run workload.jsonl [--nef PATH] [--results results.json]
+    python tools/load_generator.py compare results_a.json results_b.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import namedtuple
+from typing import Any, Dict, List, Optional, Tuple
+
+if __name__ == '__main__':
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.reference_model import CREATE_POOL_METHODS, BetOnFlybyModel, Operation, Outcome
+
+WORKLOAD_VERSION = 2
+
+# refers to the pool created by the `index`-th pool creation of the workload, whose id is only
+# known when the workload is replayed
+PoolRef = namedtuple('PoolRef', ['index'])
+
+# result of one replayed operation
+OperationResult = namedtuple('OperationResult', ['method', 'success', 'error', 'gas_consumed', 'seconds'])
+
+OPTIONS = ['home', 'draw', 'away', 'other']
+TAGS = ['sports', 'space', 'politics', 'weather']
+
+
+def zipf_weights(count: int, exponent: float) -> List[float]:
+    return [1 / (rank ** exponent) for rank in range(1, count + 1)]
+
+
+def synthesize_workload(seed: int, pools: int = 50, players: int = 200, bets: int = 2000,
+                        cancel_rate: float = 0.05, pool_skew: float = 1.1, option_skew: float = 1.5) -> List[Operation]:
+    """Returns the same valid sequence of operations for the same arguments."""
+    rng = random.Random(seed)
+    model = BetOnFlybyModel()
+    accounts = [(index + 1).to_bytes(20, 'big') for index in range(players)]
+    creators = accounts[:max(1, players // 20)]
+
+    operations: List[Operation] = []
+    pool_ids: List[bytes] = []
+    pool_weights = zipf_weights(pools, pool_skew)
+
+    def apply(operation: Operation) -> Outcome:
+        # only the operations that succeed on the model are kept in the workload
+        resolved = Operation(operation.method, resolve_args(operation.args, pool_ids),
+                             operation.signer, operation.gas)
+        outcome = model.apply(resolved)
+        if outcome.success:
+            operations.append(operation)
+        return outcome
+
+    def create_pool():
+        creator = rng.choice(creators)
+        options = OPTIONS[:rng.randint(2, len(OPTIONS))]
+        tags = rng.sample(TAGS, rng.randint(0, 2))
+        description = f'Pool {len(pool_ids)} of workload {seed}'
+        if len(tags) > 0:
+            operation = Operation('create_pool_with_settings', [creator, description, options, {'tags': tags}],
+                                  creator, 0)
+        else:
+            operation = Operation('create_pool', [creator, description, options], creator, 0)
+        pool_ids.append(apply(operation).result)
+
+    def open_pools() -> List[int]:
+        return [index for index, pool_id in enumerate(pool_ids) if not model.pools[pool_id].is_finished]
+
+    def place_bet() -> bool:
+        candidates = [index for index in open_pools()
+                      if len(model.pools[pool_ids[index]].bets) < model.pools[pool_ids[index]].max_bets]
+        if len(candidates) == 0:
+            return False
+
+        index = rng.choices(candidates, weights=[pool_weights[candidate] for candidate in candidates])[0]
+        pool = model.pools[pool_ids[index]]
+        player = rng.choice(accounts)
+        if player in pool.bets:
+            return False
+
+        option = rng.choices(pool.options, weights=zipf_weights(len(pool.options), option_skew))[0]
+        apply(Operation('bet', [player, PoolRef(index), option], player, pool.stake))
+        return True
+
+    def cancel_bet():
+        with_bets = [index for index in open_pools() if len(model.pools[pool_ids[index]].bets) > 0]
+        if len(with_bets) > 0:
+            index = rng.choice(with_bets)
+            player = rng.choice(model.pools[pool_ids[index]].sorted_bets())
+            apply(Operation('cancel_player_bet', [player, PoolRef(index)], player, 0))
+
+    def settle(index: int):
+        pool = model.pools[pool_ids[index]]
+        winners = rng.choices(pool.options, weights=zipf_weights(len(pool.options), option_skew))
+        # a pool whose prizes the contract can't pay is cancelled instead
+        if rng.random() < 0.1 or not apply(Operation('finish_pool', [PoolRef(index), winners],
+                                                     pool.creator, 0)).success:
+            apply(Operation('cancel_pool', [PoolRef(index)], pool.creator, 0))
+
+    placed_bets = 0
+    attempts = 0
+    while placed_bets < bets and attempts < bets * 10:
+        attempts += 1
+        if len(pool_ids) < pools and (len(open_pools()) == 0 or rng.random() < pools / (pools + bets)):
+            create_pool()
+        elif rng.random() < cancel_rate:
+            cancel_bet()
+        elif place_bet():
+            placed_bets += 1
+
+        # some pools are settled while the traffic goes on
+        if rng.random() < 0.01 and len(open_pools()) > 1:
+            settle(rng.choice(open_pools()))
+
+    for index in open_pools():
+        settle(index)
+
+    return operations
+
+
+def resolve_args(args: List[Any], pool_ids: List[bytes]) -> List[Any]:
+    return [pool_ids[arg.index] if isinstance(arg, PoolRef) else arg for arg in args]
+
+
+# -------------------------------------------
+# RECORDING
+# -------------------------------------------
+
+def encode_value(value: Any) -> Any:
+    if isinstance(value, PoolRef):
+        return {'pool': value.index}
+    if isinstance(value, bytes):
+        return {'hex': value.hex()}
+    if isinstance(value, list):
+        return [encode_value(element) for element in value]
+    if isinstance(value, dict):
+        return {'map': {key: encode_value(element) for key, element in value.items()}}
+    return value
+
+
+def decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if 'pool' in value:
+            return PoolRef(value['pool'])
+        if 'map' in value:
+            return {key: decode_value(element) for key, element in value['map'].items()}
+        return bytes.fromhex(value['hex'])
+    if isinstance(value, list):
+        return [decode_value(element) for element in value]
+    return value
+
+
+def save_workload(path: str, operations: List[Operation], header: Optional[Dict[str, Any]] = None):
+    with open(path, 'w') as workload_file:
+        workload_file.write(json.dumps(dict(header or {}, version=WORKLOAD_VERSION)) + '\n')
+        for operation in operations:
+            workload_file.write(json.dumps({'method': operation.method,
+                                            'args': encode_value(operation.args),
+                                            'signer': encode_value(operation.signer),
+                                            'gas': operation.gas}) + '\n')
+
+
+def load_workload(path: str) -> Tuple[Dict[str, Any], List[Operation]]:
+    with open(path) as workload_file:
+        header = json.loads(workload_file.readline())
+        if header.get('version') != WORKLOAD_VERSION:
+            raise ValueError(f"Unsupported workload version: {header.get('version')}")
+
+        operations = []
+        for line in workload_file:
+            if len(line.strip()) > 0:
+                record = json.loads(line)
+                operations.append(Operation(record['method'], decode_value(record['args']),
+                                            decode_value(record['signer']), record['gas']))
+    return header, operations
+
+
+# -------------------------------------------
+# REPLAY
+# -------------------------------------------
+
+def replay(operations: List[Operation], runner) -> List[OperationResult]:
+    """
+    Runs the operations in order with a runner that has ``apply(operation) -> Outcome``,
+    like ``engine_driver.ContractRunner``.
+    """
+    pool_ids: List[bytes] = []
+    results = []
+    for operation in operations:
+        resolved = Operation(operation.method, resolve_args(operation.args, pool_ids),
+                             operation.signer, operation.gas)
+        started = time.perf_counter()
+        outcome: Outcome = runner.apply(resolved)
+        seconds = time.perf_counter() - started
+
+        if operation.method in CREATE_POOL_METHODS:
+            pool_ids.append(outcome.result)
+        results.append(OperationResult(operation.method, outcome.success, outcome.error,
+                                       outcome.gas_consumed, seconds))
+    return results
+
+
+def percentile(values: List[int], percent: float) -> int:
+    # nearest-rank percentile
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(results: List[OperationResult]) -> Dict[str, Dict[str, Any]]:
+    by_method: Dict[str, List[OperationResult]] = {}
+    for result in results:
+        by_method.setdefault(result.method, []).append(result)
+
+    summary = {}
+    for method, method_results in sorted(by_method.items()):
+        gas = [result.gas_consumed for result in method_results if result.success]
+        summary[method] = {
+            'count': len(method_results),
+            'failures': sum(1 for result in method_results if not result.success),
+            'gas_p50': percentile(gas, 50) if gas else 0,
+            'gas_p90': percentile(gas, 90) if gas else 0,
+            'gas_p99': percentile(gas, 99) if gas else 0,
+            'gas_max': max(gas) if gas else 0,
+        }
+    return summary
+
+
+def throughput(results: List[OperationResult]) -> float:
+    seconds = sum(result.seconds for result in results)
+    return len(results) / seconds if seconds > 0 else 0.0
+
+
+def format_summary(summary: Dict[str, Dict[str, Any]]) -> str:
+    header = ['method', 'count', 'failures', 'gas_p50', 'gas_p90', 'gas_p99', 'gas_max']
+    rows = [header] + [[method] + [str(values[column]) for column in header[1:]]
+                       for method, values in summary.items()]
+    widths = [max(len(row[column]) for row in rows) for column in range(len(header))]
+    return '\n'.join('  '.join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in rows)
+
+
+def compare_summaries(before: Dict[str, Dict[str, Any]], after: Dict[str, Dict[str, Any]]) -> str:
+    lines = []
+    for method in sorted(set(before) | set(after)):
+        old = before.get(method, {}).get('gas_p50', 0)
+        new = after.get(method, {}).get('gas_p50', 0)
+        change = f'{(new - old) * 100 / old:+.1f}%' if old > 0 else 'n/a'
+        lines.append(f'{method}: p50 GAS {old} -> {new} ({change})')
+    return '\n'.join(lines)
+
+
+def save_results(path: str, workload_header: Dict[str, Any], results: List[OperationResult]):
+    with open(path, 'w') as results_file:
+        json.dump({'workload': workload_header,
+                   'throughput': throughput(results),
+                   'summary': summarize(results),
+                   'operations': [result._asdict() for result in results]}, results_file, indent=1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Synthesizes and replays BetOnFlyby workloads.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    generate = commands.add_parser('generate')
+    generate.add_argument('workload')
+    generate.add_argument('--seed', type=int, default=0)
+    generate.add_argument('--pools', type=int, default=50)
+    generate.add_argument('--players', type=int, default=200)
+    generate.add_argument('--bets', type=int, default=2000)
+
+    run = commands.add_parser('run')
+    run.add_argument('workload')
+    run.add_argument('--nef')
+    run.add_argument('--results')
+
+    compare = commands.add_parser('compare')
+    compare.add_argument('before')
+    compare.add_argument('after')
+
+    arguments = parser.parse_args()
+    if arguments.command == 'generate':
+        parameters = {'seed': arguments.seed, 'pools': arguments.pools,
+                      'players': arguments.players, 'bets': arguments.bets}
+        workload = synthesize_workload(**parameters)
+        save_workload(arguments.workload, workload, parameters)
+        print(f'{len(workload)} operations')
+
+    elif arguments.command == 'run':
+        from boa3_test.tests.test_classes.testengine import TestEngine
+        from tools.build_debug import SMART_CONTRACT_DIR
+        from tools.engine_driver import ContractRunner
+
+        nef_path = arguments.nef or os.path.join(SMART_CONTRACT_DIR, 'src', 'BetOnFlyby.nef')
+        workload_header, workload = load_workload(arguments.workload)
+        run_results = replay(workload, ContractRunner(TestEngine(SMART_CONTRACT_DIR), nef_path))
+
+        print(format_summary(summarize(run_results)))
+        print(f'throughput: {throughput(run_results):.1f} operations/s')
+        if arguments.results:
+            save_results(arguments.results, workload_header, run_results)
+
+    else:
+        with open(arguments.before) as before_file, open(arguments.after) as after_file:
+            print(compare_summaries(json.load(before_file)['summary'], json.load(after_file)['summary']))
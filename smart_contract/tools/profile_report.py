@@ -0,0 +1,117 @@
+"""
+Aggregates the ``Profile`` events of the debug contract into a per-method profile.
+
+Every public method of the contract built by ``build_debug.py`` reports its counters in a
+``Profile`` notification. Feed the notifications of each ``TestEngine`` run to a
+``ProfileReport`` and print it to see the cost of each method.
+
+Usage: python tools/profile_report.py [bets_per_pool]
+"""
+import os
+import sys
+from typing import Any, Dict, Iterable, List
+
+if __name__ == '__main__':
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.build_debug import PROFILE_EVENT_NAME
+
+COUNTERS = ['storage_reads', 'storage_writes', 'iterator_steps', 'external_calls']
+
+
+class MethodProfile:
+    def __init__(self, method: str):
+        self.method = method
+        self.calls = 0
+        self.totals = [0] * len(COUNTERS)
+        self.maximums = [0] * len(COUNTERS)
+
+    def add(self, counters: List[int]):
+        self.calls += 1
+        for index, value in enumerate(counters):
+            self.totals[index] += value
+            self.maximums[index] = max(self.maximums[index], value)
+
+    def mean(self, counter: str) -> float:
+        return self.totals[COUNTERS.index(counter)] / self.calls if self.calls > 0 else 0.0
+
+    def maximum(self, counter: str) -> int:
+        return self.maximums[COUNTERS.index(counter)]
+
+
+class ProfileReport:
+    def __init__(self):
+        self._methods: Dict[str, MethodProfile] = {}
+
+    def add_event(self, arguments: List[Any]):
+        method = arguments[0]
+        if isinstance(method, bytes):
+            method = method.decode('utf-8')
+        counters = [int(value) for value in arguments[1:1 + len(COUNTERS)]]
+
+        if method not in self._methods:
+            self._methods[method] = MethodProfile(method)
+        self._methods[method].add(counters)
+
+    def add_notifications(self, notifications: Iterable[Any]):
+        for notification in notifications:
+            self.add_event(list(notification.arguments))
+
+    def add_engine_run(self, engine):
+        """Collects the profile events of the last ``TestEngine.run``."""
+        self.add_notifications(engine.get_events(event_name=PROFILE_EVENT_NAME))
+
+    def methods(self) -> List[MethodProfile]:
+        return sorted(self._methods.values(), key=lambda profile: profile.method)
+
+    def __getitem__(self, method: str) -> MethodProfile:
+        return self._methods[method]
+
+    def format(self) -> str:
+        header = ['method', 'calls'] + [f'{counter} (mean/max)' for counter in COUNTERS]
+        rows = [header]
+        for profile in self.methods():
+            rows.append([profile.method, str(profile.calls)]
+                        + [f'{profile.mean(counter):.1f}/{profile.maximum(counter)}' for counter in COUNTERS])
+
+        widths = [max(len(row[column]) for row in rows) for column in range(len(header))]
+        return '\n'.join('  '.join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip()
+                         for row in rows)
+
+
+def profile_sample_pool(engine, nef_path: str, bets_per_pool: int) -> ProfileReport:
+    """Runs a pool through its whole life cycle on the debug contract and profiles it."""
+    report = ProfileReport()
+    price_in_gas = 1 * 10 ** 8
+    creator = bytes(20)
+    options = ['choice1', 'choice2', 'choice3']
+
+    engine.add_signer_account(creator)
+    pool_id = engine.run(nef_path, 'create_pool', creator, 'Profiled pool', options)
+    report.add_engine_run(engine)
+
+    for index in range(bets_per_pool):
+        player = (index + 1).to_bytes(20, 'little')
+        engine.add_gas(player, price_in_gas)
+        engine.add_signer_account(player)
+        engine.run(nef_path, 'bet', player, pool_id, options[index % len(options)])
+        report.add_engine_run(engine)
+
+    engine.run(nef_path, 'get_pool', pool_id)
+    report.add_engine_run(engine)
+    engine.run(nef_path, 'list_on_going_pools')
+    report.add_engine_run(engine)
+
+    engine.add_signer_account(creator)
+    engine.run(nef_path, 'finish_pool', pool_id, [options[0]])
+    report.add_engine_run(engine)
+    return report
+
+
+if __name__ == '__main__':
+    from boa3_test.tests.test_classes.testengine import TestEngine
+    from tools.build_debug import SMART_CONTRACT_DIR, build_debug_contract
+
+    bets = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    test_engine = TestEngine(SMART_CONTRACT_DIR)
+    print(profile_sample_pool(test_engine, build_debug_contract(), bets).format())
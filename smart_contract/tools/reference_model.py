@@ -0,0 +1,528 @@
+"""
+Pure-Python reference model of the BetOnFlyby contract.
+
+The model mirrors the contract's storage and GAS movements, including its error messages
+and the order its checks are made in, so any sequence of operations can be run against
+both and compared step by step. Keep it in sync with every behaviour change of the
+contract: it is what tells an optimization apart from a semantic change.
+"""
+import copy
+import hashlib
+from collections import namedtuple
+from typing import Any, Dict, List, Optional, Tuple
+
+PRICE_IN_GAS = 1 * 10 ** 8  # default bet cost is 1 GAS
+CANCEL_FEE_PERCENT = 5
+CANCELLED_RESULT = 'Cancelled by owner'
+
+DEFAULT_MAX_OPTIONS = 10
+DEFAULT_MAX_DESCRIPTION_BYTES = 256
+DEFAULT_MAX_BETS_PER_POOL = 100
+
+REVEAL_WINDOW_BLOCKS = 5760
+
+MAX_TAGS = 5
+MAX_TAG_BYTES = 32
+MAX_PAGE_SIZE = 20
+
+OWNER_ADDRESS = 'NMmy263woLS5thu238tj2WSzcYQNrP4ZqV'
+
+GAS_TOKEN = bytes.fromhex('d2a4cff31913016155e38e474a2c06d08be276cf')[::-1]
+NEO_TOKEN = bytes.fromhex('ef4073a0f2b305a38ec4050e4d3d28bc40ea63f5')[::-1]
+
+# methods whose result is the id of the pool they create
+CREATE_POOL_METHODS = ('create_pool', 'create_pool_with_settings')
+
+BASE58_ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+
+# a contract invocation: `signer` is added as signer account and, when `gas` is positive,
+# receives that amount of GAS before the invocation
+Operation = namedtuple('Operation', ['method', 'args', 'signer', 'gas'])
+
+# `error` is the exception message of a failed invocation
+Outcome = namedtuple('Outcome', ['success', 'result', 'error', 'gas_consumed'])
+
+
+class ContractError(Exception):
+    pass
+
+
+class PoolModel:
+    def __init__(self, pool_id: bytes, creator: bytes, description: str, options: List[str], tags: List[str],
+                 stake: int, cancel_fee_percent: int, max_bets: int, commit_reveal: bool = False,
+                 token: bytes = GAS_TOKEN):
+        self.pool_id = pool_id
+        self.creator = creator
+        self.description = description
+        self.options = options
+        self.tags = tags
+        self.stake = stake
+        self.cancel_fee_percent = cancel_fee_percent
+        self.max_bets = max_bets
+        self.commit_reveal = commit_reveal
+        self.token = token
+        self.result: Any = None
+        self.total_stake = 0
+        self.bets: Dict[bytes, str] = {}
+        # bets of commit-reveal pools, until they are revealed
+        self.commits: Dict[bytes, bytes] = {}
+        self.revealing = False
+        self.reveal_deadline = 0
+        # cancelled by cancel_pools, with bets not refunded yet
+        self.refunding = False
+        self.refunded_bets = 0
+        self.option_counts: Dict[str, int] = {option: 0 for option in options}
+
+    @property
+    def is_finished(self) -> bool:
+        return self.result is not None
+
+    @property
+    def bet_count(self) -> int:
+        return len(self.bets) + len(self.commits)
+
+    def sorted_bets(self) -> List[bytes]:
+        # storage iterators return the keys in ascending order
+        return sorted(self.bets)
+
+    def as_contract_result(self) -> list:
+        return [self.pool_id,
+                self.creator,
+                self.description,
+                list(self.options),
+                self.result,
+                {player: self.bets[player] for player in self.sorted_bets()}
+                ]
+
+
+def address_to_script_hash(address: str) -> bytes:
+    value = 0
+    for char in address:
+        value = value * 58 + BASE58_ALPHABET.index(char)
+    decoded = value.to_bytes(25, 'big')     # version byte + script hash + checksum
+    return decoded[1:21]
+
+
+CONTRACT_OWNER = address_to_script_hash(OWNER_ADDRESS)
+
+
+def bet_commitment(pool_id: bytes, player: bytes, option: str, salt: bytes) -> bytes:
+    """The commitment of a bet on a commit-reveal pool, as the contract checks it."""
+    option_bytes = option.encode('utf-8')
+    # the contract's int.to_bytes: little-endian, with a sign byte when the top bit is set
+    option_size = len(option_bytes).to_bytes((len(option_bytes).bit_length() + 8) // 8, 'little')
+    return hashlib.sha256(pool_id + player + option_size + option_bytes + salt).digest()
+
+
+def transfer_error(token: bytes) -> str:
+    return 'GAS transfer was not successful' if token == GAS_TOKEN else 'Token transfer was not successful'
+
+
+def remove_duplicates(list_with_dups: list) -> list:
+    new_list = []
+    for value in list_with_dups:
+        if value not in new_list:
+            new_list.append(value)
+    return new_list
+
+
+class BetOnFlybyModel:
+    def __init__(self):
+        self.pools: Dict[bytes, PoolModel] = {}
+        # balances of each token, `balances` are the GAS ones
+        self.token_balances: Dict[bytes, Dict[bytes, int]] = {GAS_TOKEN: {}}
+        self.contract_balances: Dict[bytes, int] = {GAS_TOKEN: 0}
+        self.balances = self.token_balances[GAS_TOKEN]
+        self.accepted_tokens = set()
+        self.token_volumes: Dict[bytes, int] = {}
+        self.owner = CONTRACT_OWNER
+        self.limits = [DEFAULT_MAX_OPTIONS, DEFAULT_MAX_DESCRIPTION_BYTES, DEFAULT_MAX_BETS_PER_POOL]
+        self.economics = [PRICE_IN_GAS, CANCEL_FEE_PERCENT]
+        self._created_pools = 0
+        # index of the current block, the test engine stays on the same block until told otherwise
+        self.block_height = 0
+
+    # -------------------------------------------
+    # OPERATIONS
+    # -------------------------------------------
+
+    def apply(self, operation: Operation, pool_id: Optional[bytes] = None) -> Outcome:
+        """
+        Runs an operation and returns its outcome instead of raising.
+
+        `pool_id` is the id the contract gave to a pool created by this operation; when
+        it's not given, the model derives one from its own creation counter.
+        """
+        if operation.gas > 0:
+            self.add_gas(operation.signer, operation.gas)
+        signers = {operation.signer} if operation.signer is not None else set()
+
+        try:
+            if operation.method in CREATE_POOL_METHODS:
+                result = getattr(self, operation.method)(signers, *operation.args, pool_id=pool_id)
+            else:
+                result = getattr(self, operation.method)(signers, *operation.args)
+        except ContractError as error:
+            return Outcome(False, None, str(error), 0)
+        return Outcome(True, result, None, 0)
+
+    @property
+    def contract_balance(self) -> int:
+        return self.contract_balances[GAS_TOKEN]
+
+    def add_gas(self, account: bytes, amount: int):
+        self.balances[account] = self.balances.get(account, 0) + amount
+
+    def get_pool(self, signers: set, pool_id: bytes) -> list:
+        return self._existing_pool(pool_id).as_contract_result()
+
+    def get_pool_compact(self, signers: set, pool_id: bytes) -> list:
+        pool = self.get_pool(signers, pool_id)
+        pool[5] = [[player, option] for player, option in pool[5].items()]
+        return pool
+
+    def list_on_going_pools(self, signers: set) -> list:
+        return [self.pools[pool_id].as_contract_result()
+                for pool_id in sorted(self.pools)
+                if not self.pools[pool_id].is_finished]
+
+    def list_pool_ids(self, signers: set, page: int, page_size: int) -> List[bytes]:
+        # in creation order
+        return [pool[0] for pool in self._list_page(list(self.pools), page, page_size)]
+
+    def list_pools(self, signers: set, page: int, page_size: int) -> list:
+        return self._list_page(list(self.pools), page, page_size)
+
+    def list_pools_by_tag(self, signers: set, tag: str, page: int, page_size: int) -> list:
+        if len(tag) == 0 or len(tag.encode('utf-8')) > MAX_TAG_BYTES:
+            raise ContractError('Invalid tag')
+        return self._list_page([pool_id for pool_id in sorted(self.pools) if tag in self.pools[pool_id].tags],
+                               page, page_size)
+
+    def list_pools_by_creator(self, signers: set, creator: bytes, page: int, page_size: int) -> list:
+        if len(creator) != 20:
+            raise ContractError('Invalid creator')
+        return self._list_page([pool_id for pool_id in sorted(self.pools) if self.pools[pool_id].creator == creator],
+                               page, page_size)
+
+    def create_pool(self, signers: set, creator: bytes, description: str, options: List[str],
+                    pool_id: Optional[bytes] = None) -> bytes:
+        return self.create_pool_with_settings(signers, creator, description, options, {}, pool_id=pool_id)
+
+    def create_pool_with_settings(self, signers: set, creator: bytes, description: str, options: List[str],
+                                  settings: Dict[str, Any], pool_id: Optional[bytes] = None) -> bytes:
+        tags = settings.get('tags', [])
+        stake = settings.get('stake', -1)
+        cancel_fee_percent = settings.get('cancel_fee_percent', -1)
+        commit_reveal = settings.get('commit_reveal', False)
+        token = settings.get('token', GAS_TOKEN)
+
+        if creator not in signers:
+            raise ContractError('No authorization.')
+
+        options = remove_duplicates(options)
+        if len(options) < 2:
+            raise ContractError('Not enough options to create a pool')
+        for option in options:
+            if len(option) == 0:
+                raise ContractError('Cannot have an empty option')
+
+        if len(options) > self.limits[0]:
+            raise ContractError('Too many options to create a pool')
+        if len(description.encode('utf-8')) > self.limits[1]:
+            raise ContractError('Description is too long')
+
+        tags = remove_duplicates(tags)
+        if len(tags) > MAX_TAGS:
+            raise ContractError('Too many tags')
+        for tag in tags:
+            if len(tag) == 0 or len(tag.encode('utf-8')) > MAX_TAG_BYTES:
+                raise ContractError('Invalid tag')
+
+        if token != GAS_TOKEN:
+            if token not in self.accepted_tokens:
+                raise ContractError('Token is not accepted')
+            if stake < 0:
+                raise ContractError('Invalid pool economics')
+
+        if stake < 0:
+            stake = self.economics[0]
+        if cancel_fee_percent < 0:
+            cancel_fee_percent = self.economics[1]
+        if stake == 0 or cancel_fee_percent > 100:
+            raise ContractError('Invalid pool economics')
+
+        self._created_pools += 1
+        if pool_id is None:
+            pool_id = hashlib.sha256(self._created_pools.to_bytes(8, 'little')).digest()
+
+        self.pools[pool_id] = PoolModel(pool_id, creator, description, options, tags,
+                                        stake, cancel_fee_percent, self.limits[2], commit_reveal, token)
+        return pool_id
+
+    def finish_pool(self, signers: set, pool_id: bytes, winner_options: List[str]):
+        pool = self._existing_pool(pool_id)
+        if pool.creator not in signers:
+            raise ContractError('No authorization.')
+        if pool.is_finished:
+            raise ContractError('Pool is finished already')
+        if len(winner_options) == 0:
+            raise ContractError('At least one winner is required')
+        if pool.commit_reveal and not pool.revealing:
+            raise ContractError('Bets are not being revealed')
+        if pool.commit_reveal and self.block_height < pool.reveal_deadline and len(pool.commits) > 0:
+            raise ContractError('Bets are still being revealed')
+
+        winner_options = remove_duplicates(winner_options)
+        for option in winner_options:
+            if option not in pool.options:
+                raise ContractError('Invalid option for this pool')
+
+        winners = [player for player in pool.sorted_bets() if pool.bets[player] in winner_options]
+        if len(winners) > 0:
+            prize_per_winner = pool.total_stake // len(winners)
+            self._pay(pool.token, {winner: prize_per_winner for winner in winners})
+
+        pool.result = winner_options
+        self.token_volumes[pool.token] = self.token_volumes.get(pool.token, 0) + pool.total_stake
+
+    def cancel_pool(self, signers: set, pool_id: bytes):
+        pool = self._existing_pool(pool_id)
+        if pool.creator not in signers:
+            raise ContractError('No authorization.')
+        if pool.is_finished:
+            raise ContractError('Pool is finished already')
+
+        refunded = list(pool.bets) + list(pool.commits)
+        self._pay(pool.token, {player: pool.stake for player in refunded})
+        pool.result = CANCELLED_RESULT
+
+    def cancel_pools(self, signers: set, pool_ids: List[bytes], max_refunds: int) -> List[bytes]:
+        if self.owner not in signers:
+            raise ContractError('No authorization.')
+        if max_refunds < 1:
+            raise ContractError('Invalid batch size')
+
+        # the contract pays the refunds after cancelling the pools, so they're undone if it can't
+        saved_pools = {pool_id: copy.deepcopy(self.pools[pool_id]) for pool_id in pool_ids if pool_id in self.pools}
+        try:
+            refunds, pending_pools = self._cancel_pools(pool_ids, max_refunds)
+            for token, token_refunds in refunds.items():
+                if sum(token_refunds.values()) > self.contract_balances.get(token, 0):
+                    raise ContractError(transfer_error(token))
+        except ContractError:
+            self.pools.update(saved_pools)
+            raise
+
+        for token, token_refunds in refunds.items():
+            self._pay(token, token_refunds)
+        return pending_pools
+
+    def _cancel_pools(self, pool_ids: List[bytes],
+                      max_refunds: int) -> Tuple[Dict[bytes, Dict[bytes, int]], List[bytes]]:
+        refunds: Dict[bytes, Dict[bytes, int]] = {}
+        pending_pools = []
+        refunded_bets = 0
+
+        for pool_id in remove_duplicates(pool_ids):
+            pool = self._existing_pool(pool_id)
+            if not pool.refunding and not pool.is_finished:
+                pool.result = CANCELLED_RESULT
+                pool.refunding = True
+            if not pool.refunding:
+                continue
+
+            token_refunds = refunds.setdefault(pool.token, {})
+            # like the storage iterators, the bets are refunded in ascending order of the players;
+            # they are kept, the ones refunded by the previous batches are skipped
+            players = sorted(pool.bets) + (sorted(pool.commits) if pool.commit_reveal else [])
+            bets_left = players[pool.refunded_bets:]
+            batch = bets_left[:max_refunds - refunded_bets]
+            for player in batch:
+                token_refunds[player] = token_refunds.get(player, 0) + pool.stake
+            refunded_bets += len(batch)
+
+            if len(batch) < len(bets_left):
+                # the batch is full before the last bets of the pool
+                pool.refunded_bets += len(batch)
+                pending_pools.append(pool_id)
+            else:
+                pool.refunding = False
+                pool.refunded_bets = 0
+
+        return refunds, pending_pools
+
+    def cancel_player_bet(self, signers: set, player: bytes, pool_id: bytes):
+        pool = self._existing_pool(pool_id)
+        if player not in signers:
+            raise ContractError('No authorization.')
+        if pool.is_finished:
+            raise ContractError('Pool is finished already')
+
+        player_bets = pool.bets
+        if pool.commit_reveal:
+            if pool.revealing:
+                raise ContractError('Bets are being revealed already')
+            player_bets = pool.commits
+        if player not in player_bets:
+            raise ContractError("Player didn't bet on this pool")
+
+        # the fee stays in the contract and the pool's total stake isn't reduced
+        self._pay(pool.token, {player: pool.stake - pool.stake * pool.cancel_fee_percent // 100})
+        del player_bets[player]
+
+    def bet(self, signers: set, player: bytes, pool_id: bytes, bet_option: str):
+        pool = self._existing_pool(pool_id)
+        if player not in signers:
+            raise ContractError('No authorization.')
+        if pool.is_finished:
+            raise ContractError('Pool is finished already')
+        if pool.commit_reveal:
+            raise ContractError('Bets on this pool must be committed')
+        if player in pool.bets:
+            raise ContractError('Only one bet is allowed per account')
+        if bet_option not in pool.options:
+            raise ContractError('Invalid option for this pool')
+
+        self._take_stake(player, pool)
+        pool.bets[player] = bet_option
+
+    def commit_bet(self, signers: set, player: bytes, pool_id: bytes, commitment: bytes):
+        pool = self._existing_pool(pool_id)
+        if player not in signers:
+            raise ContractError('No authorization.')
+        if pool.is_finished:
+            raise ContractError('Pool is finished already')
+        if not pool.commit_reveal:
+            raise ContractError('Pool does not take committed bets')
+        if pool.revealing:
+            raise ContractError('Bets are being revealed already')
+        if player in pool.commits:
+            raise ContractError('Only one bet is allowed per account')
+        if len(commitment) != 32:
+            raise ContractError('Invalid commitment')
+
+        self._take_stake(player, pool)
+        pool.commits[player] = commitment
+
+    def start_reveal(self, signers: set, pool_id: bytes):
+        pool = self._existing_pool(pool_id)
+        if pool.creator not in signers:
+            raise ContractError('No authorization.')
+        if pool.is_finished:
+            raise ContractError('Pool is finished already')
+        if not pool.commit_reveal:
+            raise ContractError('Pool does not take committed bets')
+        if pool.revealing:
+            raise ContractError('Bets are being revealed already')
+
+        pool.revealing = True
+        pool.reveal_deadline = self.block_height + REVEAL_WINDOW_BLOCKS
+
+    def reveal_bets(self, signers: set, pool_id: bytes, reveals: List[list]) -> int:
+        pool = self.pools.get(pool_id)
+        if pool is None or not pool.revealing:
+            raise ContractError('Bets are not being revealed')
+        if pool.is_finished:
+            raise ContractError('Pool is finished already')
+
+        revealed_bets = 0
+        for reveal in reveals:
+            # malformed reveals and reveals that don't match a commitment are skipped
+            if len(reveal) != 3 or len(reveal[0]) != 20:
+                continue
+            player, option, salt = reveal
+            if option in pool.options and pool.commits.get(player) == bet_commitment(pool_id, player, option, salt):
+                del pool.commits[player]
+                pool.bets[player] = option
+                pool.option_counts[option] += 1
+                revealed_bets += 1
+        return revealed_bets
+
+    def get_option_counts(self, signers: set, pool_id: bytes) -> Dict[str, int]:
+        pool = self._existing_pool(pool_id)
+        if not pool.commit_reveal:
+            raise ContractError('Pool does not take committed bets')
+        return dict(pool.option_counts)
+
+    def get_pool_header(self, signers: set, pool_id: bytes) -> List[int]:
+        pool = self._existing_pool(pool_id)
+        return [pool.stake, pool.cancel_fee_percent, pool.max_bets, 1 if pool.commit_reveal else 0, pool.token]
+
+    def get_token_volume(self, signers: set, token: bytes) -> int:
+        return self.token_volumes.get(token, 0)
+
+    def is_token_accepted(self, signers: set, token: bytes) -> bool:
+        return token == GAS_TOKEN or token in self.accepted_tokens
+
+    def set_token_accepted(self, signers: set, token: bytes, accepted: bool):
+        if self.owner not in signers:
+            raise ContractError('No authorization.')
+
+        if accepted:
+            self.accepted_tokens.add(token)
+        else:
+            self.accepted_tokens.discard(token)
+
+    def get_limits(self, signers: set) -> List[int]:
+        return list(self.limits)
+
+    def set_limits(self, signers: set, max_options: int, max_description_bytes: int, max_bets_per_pool: int):
+        if self.owner not in signers:
+            raise ContractError('No authorization.')
+        if max_options < 2 or max_description_bytes < 0 or max_bets_per_pool < 1:
+            raise ContractError('Invalid limits')
+
+        self.limits = [max_options, max_description_bytes, max_bets_per_pool]
+
+    def get_economics(self, signers: set) -> List[int]:
+        return list(self.economics)
+
+    def set_economics(self, signers: set, default_stake: int, default_cancel_fee_percent: int):
+        if self.owner not in signers:
+            raise ContractError('No authorization.')
+        if default_stake <= 0 or default_cancel_fee_percent < 0 or default_cancel_fee_percent > 100:
+            raise ContractError('Invalid pool economics')
+
+        self.economics = [default_stake, default_cancel_fee_percent]
+
+    # -------------------------------------------
+    # HELPERS
+    # -------------------------------------------
+
+    def _existing_pool(self, pool_id: bytes) -> PoolModel:
+        if pool_id not in self.pools:
+            raise ContractError("Pool doesn't exist.")
+        return self.pools[pool_id]
+
+    def _take_stake(self, player: bytes, pool: PoolModel):
+        if pool.bet_count >= pool.max_bets:
+            raise ContractError('Pool is full')
+        balances = self.token_balances.setdefault(pool.token, {})
+        if balances.get(player, 0) < pool.stake:
+            raise ContractError(transfer_error(pool.token))
+        if pool.token != GAS_TOKEN and pool.token not in self.accepted_tokens:
+            # refused by the contract when the token calls it back
+            raise ContractError('Token is not accepted')
+
+        balances[player] -= pool.stake
+        self.contract_balances[pool.token] = self.contract_balances.get(pool.token, 0) + pool.stake
+        pool.total_stake += pool.stake
+
+    def _list_page(self, pool_ids: List[bytes], page: int, page_size: int) -> list:
+        if page < 0 or page_size < 1 or page_size > MAX_PAGE_SIZE:
+            raise ContractError('Invalid page')
+
+        first = page * page_size
+        return [self.pools[pool_id].as_contract_result() for pool_id in pool_ids[first:first + page_size]]
+
+    def _pay(self, token: bytes, payments: Dict[bytes, int]):
+        # the transfers run in a single transaction: if the contract can't pay all of them
+        # the invocation faults and nothing is paid
+        if sum(payments.values()) > self.contract_balances.get(token, 0):
+            raise ContractError(transfer_error(token))
+
+        balances = self.token_balances.setdefault(token, {})
+        for account, amount in payments.items():
+            self.contract_balances[token] = self.contract_balances.get(token, 0) - amount
+            balances[account] = balances.get(account, 0) + amount
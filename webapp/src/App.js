@@ -1,5 +1,5 @@
 import Neon, { wallet, rpc, tx, u, sc, Signer } from "@cityofzion/neon-js";
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import { BrowserRouter as Router, Switch, Route } from "react-router-dom";
 
 import "./App.css";
@@ -17,10 +17,22 @@ import hero4 from "./4.png";
 const images = [hero1, hero2, hero3, hero4];
 
 export const FLYBY_CONTRACT = "0xa9ab4ea48570270b4c4c9b47a97340f545dfd9a8";
+// the screens only need the changes they haven't read yet
+const MAX_POOL_CHANGES = 50;
 
 function App() {
   const [invokeDetected, setInvokeDetected] = useState(false);
   const [randomImage, setRandomImage] = useState("");
+  const [poolChanges, setPoolChanges] = useState([]);
+  const nextPoolChange = useRef(1);
+
+  function handlePoolChange(change) {
+    const numberedChange = { ...change, number: nextPoolChange.current++ };
+    setPoolChanges((changes) => [
+      ...changes.slice(1 - MAX_POOL_CHANGES),
+      numberedChange,
+    ]);
+  }
 
   useEffect(() => {
     setRandomImage(images[Math.floor(Math.random() * images.length)]);
@@ -47,24 +59,26 @@ function App() {
               : {}
           }
         >
-          <DoraConnector setInvokeDetected={setInvokeDetected} />
+          <DoraConnector
+            setInvokeDetected={setInvokeDetected}
+            onPoolChange={handlePoolChange}
+          />
 
-          <div>
-            {!invokeDetected && (
-              <Switch>
-                <Route path="/place-bet">
-                  <PlaceBet />
-                </Route>
+          {/* hidden instead of unmounted, so the screens keep the pools they read */}
+          <div className={invokeDetected ? "hidden" : ""}>
+            <Switch>
+              <Route path="/place-bet">
+                <PlaceBet poolChanges={poolChanges} />
+              </Route>
 
-                <Route path="/results">
-                  <Results />
-                </Route>
+              <Route path="/results">
+                <Results />
+              </Route>
 
-                <Route path="/">
-                  <About />
-                </Route>
-              </Switch>
-            )}
+              <Route path="/">
+                <About />
+              </Route>
+            </Switch>
           </div>
         </main>
       </Router>
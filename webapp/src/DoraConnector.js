@@ -1,28 +1,48 @@
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 
 import { FLYBY_CONTRACT } from "./App";
 
-function DoraConnector({ setInvokeDetected = () => null }) {
+// ChangeImage notifications carry [sender, pool id, change kind]
+function parsePoolChange({ state }) {
+  const [, poolId, kind] = state.value;
+  return poolId && kind
+    ? { poolId: poolId.value, kind: atob(kind.value) }
+    : null;
+}
+
+function DoraConnector({
+  setInvokeDetected = () => null,
+  onPoolChange = () => null,
+}) {
   const [currentBlock, setCurrenBlock] = useState(0);
+  // the latest callbacks, so the socket isn't opened again on every render
+  const callbacks = useRef({ setInvokeDetected, onPoolChange });
+  callbacks.current = { setInvokeDetected, onPoolChange };
+
   useEffect(() => {
     const socket = new WebSocket(
       `wss://dora.coz.io/ws/v1/neo3/testnet/log/${FLYBY_CONTRACT}`
     );
     socket.onmessage = function (event) {
+      const { setInvokeDetected, onPoolChange } = callbacks.current;
       console.log("incoming socket event:", { event });
       const data = JSON.parse(event.data);
       setCurrenBlock(data.height);
-      if (
-        data.log &&
-        data.log.notifications.find((e) => e.event_name === "ChangeImage")
-      ) {
+      const changes = data.log
+        ? data.log.notifications.filter((e) => e.event_name === "ChangeImage")
+        : [];
+      if (changes.length > 0) {
+        // lets the screens patch only the pools that changed
+        changes.map(parsePoolChange).filter(Boolean).forEach(onPoolChange);
+
         setInvokeDetected(true);
         setTimeout(() => {
           setInvokeDetected(false);
         }, 7500);
       }
     };
-  });
+    return () => socket.close();
+  }, []);
 
   return (
     <code className="bg-darkGrey">
@@ -1,4 +1,4 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useMemo, useRef } from "react";
 import Neon, { wallet, rpc, tx, u, sc, Signer } from "@cityofzion/neon-js";
 import Select from "react-select";
 
@@ -37,47 +37,65 @@ function Connect({ handleUpdateStep, setWif }) {
   );
 }
 
-function Bet({ config, handleUpdateStep, passOptionInfo }) {
+function flybyContract(config) {
+  return new Neon.experimental.SmartContract(
+    Neon.u.HexString.fromHex(FLYBY_CONTRACT),
+    {
+      networkMagic: config.networkMagic,
+      rpcAddress: config.nodeUrl,
+      account: config.fromAccount,
+    }
+  );
+}
+
+function parsePoolData({ value: data }) {
+  // [pool_id, pool_creator_account, pool_description, pool_options, pool_result, pool_bets]
+  return {
+    name: atob(data[2].value),
+    options: data[3].value.map(({ value }) => {
+      return {
+        id: value,
+        label: atob(value),
+      };
+    }),
+    id: data[0].value,
+    isOpen: data[4].type === "Any",
+  };
+}
+
+// replaces a pool that changed, adding it if it's new and removing it once it's closed
+function patchPools(pools, changedPool) {
+  const others = pools.filter(({ id }) => id !== changedPool.id);
+  if (!changedPool.isOpen) {
+    return others;
+  }
+  if (others.length === pools.length) {
+    return [...pools, changedPool];
+  }
+  return pools.map((pool) => (pool.id === changedPool.id ? changedPool : pool));
+}
+
+function Bet({ config, poolChanges, handleUpdateStep, passOptionInfo }) {
   const [pools, setPools] = useState([]);
   const [pool, setPool] = useState(null);
   const [option, setOption] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState("");
-
-  function parsePoolData({ value }) {
-    const data = value[0].value;
-    console.log({ data });
-
-    // [pool_id, pool_creator_account, pool_description, pool_options, pool_result]
-    const parsedPoolData = {
-      name: atob(data[2].value),
-      options: data[3].value.map(({ value }) => {
-        return {
-          id: value,
-          label: atob(value),
-        };
-      }),
-      id: data[0].value,
-    };
-
-    return parsedPoolData;
-  }
+  // number of the last pool change read, the list is read after all of them
+  const lastPoolChange = useRef(
+    poolChanges.length > 0 ? poolChanges[poolChanges.length - 1].number : 0
+  );
 
   useEffect(() => {
     async function getPools() {
       setLoading(true);
       try {
-        const contract = new Neon.experimental.SmartContract(
-          Neon.u.HexString.fromHex(FLYBY_CONTRACT),
-          {
-            networkMagic: config.networkMagic,
-            rpcAddress: config.nodeUrl,
-            account: config.fromAccount,
-          }
+        const results = await flybyContract(config).testInvoke(
+          "list_on_going_pools",
+          []
         );
-        const results = await contract.testInvoke("list_on_going_pools", []);
 
-        const pools = results.stack.map(parsePoolData);
+        const pools = results.stack[0].value.map(parsePoolData);
         console.log("getPools() results: ", { results, pools });
 
         setPools(pools);
@@ -90,6 +108,34 @@ function Bet({ config, handleUpdateStep, passOptionInfo }) {
     getPools();
   }, [config]);
 
+  useEffect(() => {
+    const newChanges = poolChanges.filter(
+      ({ number }) => number > lastPoolChange.current
+    );
+    if (newChanges.length === 0) {
+      return;
+    }
+    lastPoolChange.current = newChanges[newChanges.length - 1].number;
+
+    // only the pools that changed are read again
+    const changedPoolIds = [...new Set(newChanges.map(({ poolId }) => poolId))];
+    async function getChangedPools() {
+      const contract = flybyContract(config);
+      for (const poolId of changedPoolIds) {
+        try {
+          const results = await contract.testInvoke("get_pool", [
+            sc.ContractParam.byteArray(u.HexString.fromBase64(poolId)),
+          ]);
+          const changedPool = parsePoolData(results.stack[0]);
+          setPools((pools) => patchPools(pools, changedPool));
+        } catch (e) {
+          console.error({ e });
+        }
+      }
+    }
+    getChangedPools();
+  }, [config, poolChanges]);
+
   function handleSelectPool(pool) {
     const selectedPool = pools.find(({ name }) => name === pool.label);
     setPool(selectedPool);
@@ -233,7 +279,7 @@ function Confirm({ config, selectedOptionInfo }) {
   );
 }
 
-function PlaceBet() {
+function PlaceBet({ poolChanges = [] }) {
   const [currentStep, setCurrentStep] = useState(CONNECT);
   const [wif, setWif] = useState("");
   const [selectedOptionInfo, setSelectedOptionInfo] = useState({
@@ -241,15 +287,19 @@ function PlaceBet() {
     option: "",
   });
 
-  const config = {
-    fromAccount: wif && new wallet.Account(wif),
-    tokenScriptHash: FLYBY_CONTRACT,
-    amountToTransfer: 0.1,
-    systemFee: 0,
-    networkFee: 0,
-    networkMagic: 844378958,
-    nodeUrl: NODE_URL,
-  };
+  // the same config until the wallet changes, so the pools aren't listed again on every render
+  const config = useMemo(
+    () => ({
+      fromAccount: wif && new wallet.Account(wif),
+      tokenScriptHash: FLYBY_CONTRACT,
+      amountToTransfer: 0.1,
+      systemFee: 0,
+      networkFee: 0,
+      networkMagic: 844378958,
+      nodeUrl: NODE_URL,
+    }),
+    [wif]
+  );
 
   function returnCurrentStepContent(step) {
     switch (true) {
@@ -260,6 +310,7 @@ function PlaceBet() {
           <Bet
             handleUpdateStep={setCurrentStep}
             config={config}
+            poolChanges={poolChanges}
             passOptionInfo={({ poolName, option }) =>
               setSelectedOptionInfo({ poolName, option })
             }